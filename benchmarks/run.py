@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from src.main import diff_records
+from src.pocketcasts import PocketCastsClient
+from src.sqlite_store import SQLiteStore
+from src.sync import sync_history
+from src.transport import Transport, default_retries
+
+from .stub_server import StubAPIServer
+from .synthetic import generate_history
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+DEFAULT_SIZE = 10000
+DEFAULT_TOLERANCE = 0.5
+# Differences smaller than this are timer noise, not regressions.
+MIN_REGRESSION_SECONDS = 0.005
+
+def timed(function, repeat: int, setup=None) -> float:
+    """Best of repeat runs. setup() is called before each run, outside the
+    timing, and its result is passed to function."""
+    best = None
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        start = time.perf_counter()
+        function(argument)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def run_benchmarks(size: int = DEFAULT_SIZE, repeat: int = 3) -> dict:
+    history = generate_history(size)
+    episodes = history['episodes']
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = iter(os.path.join(directory, f'{i}.db') for i in range(1000))
+
+        def empty_store(_=None):
+            return SQLiteStore(next(paths))
+
+        def filled_store(_=None):
+            store = empty_store()
+            store.save_records(episodes)
+            return store
+
+        results['save_records'] = timed(lambda store: store.save_records(episodes), repeat, empty_store)
+        results['save_records_unchanged'] = timed(lambda store: store.save_records(episodes), repeat, filled_store)
+
+        store = filled_store()
+        existing = store.get_records(size)
+        results['diff_records'] = timed(lambda _: diff_records(episodes, existing[:size // 2]), repeat)
+        results['get_records'] = timed(lambda _: store.get_records(size), repeat)
+        results['iter_records'] = timed(lambda _: sum(len(batch) for batch in store.iter_records()), repeat)
+        results['get_records_by_uuid'] = timed(lambda _: store.get_records_by_uuid(episodes), repeat)
+        results['search_records'] = timed(lambda _: store.search_records('bloomberg podc', limit=50), repeat)
+        results['get_stats'] = timed(lambda _: store.get_stats('podcast') and store.get_stats_summary(), repeat)
+        store.close()
+
+        with StubAPIServer(history) as server:
+            base_url = server.base_url
+
+            def sync(store, stream=False, transport=None):
+                client = PocketCastsClient('stub-token', transport, api_url=base_url, podcast_api_url=base_url)
+                sync_history(client, store, stream=stream)
+                store.close()
+
+            results['sync_end_to_end'] = timed(sync, repeat, empty_store)
+            results['sync_end_to_end_stream'] = timed(lambda store: sync(store, stream=True), repeat, empty_store)
+
+            def sync_unchanged(store):
+                client = PocketCastsClient('stub-token', api_url=base_url, podcast_api_url=base_url)
+                sync_history(client, store)
+            synced = empty_store()
+            sync_unchanged(synced)
+            results['sync_unchanged'] = timed(lambda _: sync_unchanged(synced), repeat)
+            synced.close()
+
+            # Failure path: two 503s before the history comes through.
+            def sync_retry(store):
+                server.fail_history(2)
+                transport = Transport(retries=default_retries(total=3, backoff_factor=0))
+                sync(store, transport=transport)
+            results['sync_retry'] = timed(sync_retry, repeat, empty_store)
+
+            cassette = os.path.join(directory, 'cassette.json')
+            recorder = empty_store()
+            sync(recorder, transport=Transport(cassette=cassette, mode='record'))
+
+        # Replays the recorded sync with no server running at all.
+        results['sync_replay'] = timed(
+            lambda store: sync(store, transport=Transport(cassette=cassette, mode='replay')), repeat, empty_store
+        )
+
+    return results
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, seconds in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if seconds > expected * (1 + tolerance) and seconds - expected > MIN_REGRESSION_SECONDS:
+            regressions.append(f'{name}: {seconds:.4f}s vs baseline {expected:.4f}s')
+    return regressions
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark ingest, diff, query and sync paths.')
+    parser.add_argument('--size', type=int, default=DEFAULT_SIZE, help='episodes in the synthetic history')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark, best is kept')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline JSON file')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='allowed slowdown, 0.5 = 50%%')
+    parser.add_argument('--update-baseline', action='store_true', help='write results as the new baseline')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.size, args.repeat)
+    for name, seconds in results.items():
+        print(f'{name:<26} {seconds:.4f}s')
+
+    if args.update_baseline:
+        baselines = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'r', encoding='utf-8') as file:
+                baselines = json.load(file)
+        baselines[str(args.size)] = results
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+        print(f'Baseline for {args.size} episodes written to {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print('No baseline file, skipping comparison.')
+        return 0
+    with open(args.baseline, 'r', encoding='utf-8') as file:
+        baseline = json.load(file).get(str(args.size))
+    if baseline is None:
+        print(f'No baseline recorded for {args.size} episodes, skipping comparison.')
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .synthetic import generate_podcast
+
+class StubAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, body: bytes, etag=None):
+        if etag and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+
+        if self.path == '/user/login':
+            self.send_json(b'{"token": "stub-token"}')
+        elif self.path == '/user/history':
+            if self.server.take_failure():
+                self.send_response(503)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_json(self.server.history_body, self.server.history_etag)
+        else:
+            self.send_json(b'{}')
+
+    def do_GET(self):
+        if self.path.startswith('/podcast/full/'):
+            podcast_uuid = self.path.rsplit('/', 1)[-1]
+            self.send_json(json.dumps(generate_podcast(podcast_uuid, self.server.podcast_episodes)).encode())
+        else:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+class StubAPIServer(ThreadingHTTPServer):
+    """Local stand-in for the Pocket Casts API serving a fixed history.
+    Use as a context manager; base_url is set once it is listening."""
+    daemon_threads = True
+
+    def __init__(self, history: dict, podcast_episodes: int = 50):
+        super().__init__(('127.0.0.1', 0), StubAPIHandler)
+        self.set_history(history)
+        self.podcast_episodes = podcast_episodes
+        self.base_url = f'http://127.0.0.1:{self.server_port}'
+        self.thread = None
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def fail_history(self, count: int):
+        """Answers the next count history requests with a 503."""
+        with self.lock:
+            self.failures = count
+
+    def take_failure(self) -> bool:
+        with self.lock:
+            if self.failures <= 0:
+                return False
+            self.failures -= 1
+            return True
+
+    def set_history(self, history: dict):
+        self.history_body = json.dumps(history).encode()
+        self.history_etag = f'"{hashlib.sha256(self.history_body).hexdigest()[:16]}"'
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
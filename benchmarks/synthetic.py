@@ -0,0 +1,66 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+
+AUTHORS = ['Bloomberg', 'TWiT', 'The Art of Manliness', 'NPR', 'Relay FM', 'Gimlet', 'BBC Radio 4']
+
+def make_podcasts(count: int, rng: random.Random) -> list[dict]:
+    return [
+        {
+            'uuid': str(uuid.UUID(int=rng.getrandbits(128))),
+            'title': f'Podcast {i}',
+            'author': rng.choice(AUTHORS),
+        }
+        for i in range(count)
+    ]
+
+def generate_history(count: int, seed: int = 0, podcasts: int = 200) -> dict:
+    """Builds a /user/history payload with count episodes in the Pocket
+    Casts schema, newest first. The same seed always gives the same data."""
+    rng = random.Random(seed)
+    shows = make_podcasts(podcasts, rng)
+    published = datetime(2024, 1, 1)
+
+    episodes = []
+    for i in range(count):
+        show = rng.choice(shows)
+        episode_uuid = str(uuid.UUID(int=rng.getrandbits(128)))
+        duration = rng.randint(300, 10800)
+        published -= timedelta(minutes=rng.randint(1, 600))
+        episodes.append({
+            'uuid': episode_uuid,
+            'url': f'https://media.example.com/{show["uuid"]}/{episode_uuid}.mp3',
+            'published': published.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'duration': duration,
+            'fileType': 'audio/mpeg',
+            'title': f'{show["title"]} #{count - i}',
+            'size': str(duration * 16000 if rng.random() > 0.05 else 0),
+            'playingStatus': 3,
+            'playedUpTo': duration,
+            'starred': rng.random() < 0.1,
+            'podcastUuid': show['uuid'],
+            'podcastTitle': show['title'],
+            'episodeType': 'full',
+            'episodeSeason': 0,
+            'episodeNumber': count - i,
+            'isDeleted': False,
+            'author': show['author'],
+            'bookmarks': [],
+        })
+
+    return { 'total': count, 'episodes': episodes }
+
+def generate_podcast(podcast_uuid: str, count: int, seed: int = 0) -> dict:
+    """Builds a podcast/full/{uuid} payload with count episodes."""
+    rng = random.Random(seed)
+    return {
+        'podcast': {
+            'uuid': podcast_uuid,
+            'title': f'Podcast {podcast_uuid[:8]}',
+            'author': rng.choice(AUTHORS),
+            'episodes': [
+                { 'uuid': str(uuid.UUID(int=rng.getrandbits(128))), 'title': f'Episode {i}', 'duration': rng.randint(300, 10800) }
+                for i in range(count)
+            ],
+        }
+    }
@@ -0,0 +1,109 @@
+import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from .auth import CachedLogin, TokenCache
+from .main import configure_logging
+from .pocketcasts import PocketCastsClient
+from .sqlite_store import SQLiteStore
+from .sync import sync_history
+from .transport import create_transport
+
+DEFAULT_MAX_WORKERS = 4
+
+def load_accounts(path: str) -> list[dict]:
+    """Reads a JSON list of {"username": ..., "password": ...} objects. An
+    optional "name" sets the database file name for that account."""
+    with open(path, 'r', encoding='utf-8') as file:
+        accounts = json.load(file)
+
+    for account in accounts:
+        if not account.get('username') or not account.get('password'):
+            raise ValueError(f'Account entry is missing a username or password: {account.get("name", "")}')
+
+    return accounts
+
+def account_db_path(data_dir: str, account: dict) -> str:
+    name = account.get('name') or account['username']
+    slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', name).strip('_.')
+    return os.path.join(data_dir, f'{slug}.db')
+
+def sync_account(http, account: dict, data_dir: str, cache: TokenCache, stream=False) -> dict:
+    summary = { 'account': account.get('name') or account['username'], 'error': None }
+    # SQLite connections are per thread, so each task opens its own store.
+    store = SQLiteStore(account_db_path(data_dir, account))
+    try:
+        login = CachedLogin(http, account['username'], account['password'], cache)
+        client = PocketCastsClient(None, http, login=login)
+        if not client.token:
+            summary['error'] = 'Login failed.'
+            return summary
+        summary.update(sync_history(client, store, stream=stream))
+    except Exception as e:
+        summary['error'] = str(e)
+    finally:
+        store.close()
+
+    return summary
+
+def sync_accounts(accounts: list[dict], data_dir: str, max_workers: int = DEFAULT_MAX_WORKERS,
+                  http=None, cache=None, stream=False) -> dict:
+    """Syncs every account on a bounded thread pool, one database file per
+    account, and returns the per-account summaries with run totals."""
+    # Names are slugged, so different usernames can map to one file; two
+    # accounts sharing a database would mix histories and sync state.
+    # Compared case-insensitively for filesystems that ignore case.
+    paths = {}
+    for account in accounts:
+        path = account_db_path(data_dir, account)
+        other = paths.setdefault(path.lower(), account)
+        if other is not account:
+            raise ValueError(
+                f"Accounts '{other.get('name') or other['username']}' and "
+                f"'{account.get('name') or account['username']}' would share {path}; give one a different name."
+            )
+
+    os.makedirs(data_dir, exist_ok=True)
+    http = http or create_transport(max_workers)
+    cache = cache or TokenCache(os.path.join(data_dir, 'token_cache.json'))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(
+            lambda account: sync_account(http, account, data_dir, cache, stream), accounts
+        ))
+
+    totals = { 'accounts': len(results), 'failed': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0 }
+    for result in results:
+        if result['error']:
+            totals['failed'] += 1
+        for key in ('inserted', 'updated', 'unchanged'):
+            totals[key] += result.get(key, 0)
+
+    return { 'results': results, 'totals': totals }
+
+if __name__ == "__main__":
+    logger = configure_logging()
+
+    load_dotenv()
+    if not 'ACCOUNTS_FILE' in os.environ:
+        logger.error('ACCOUNTS_FILE environment variable was not found.')
+        sys.exit()
+
+    data_dir = os.environ.get('DATA_DIR', '/app/data' if os.path.exists('/.dockerenv') else 'data')
+    max_workers = int(os.environ.get('SYNC_WORKERS', DEFAULT_MAX_WORKERS))
+    summary = sync_accounts(
+        load_accounts(os.environ['ACCOUNTS_FILE']),
+        data_dir,
+        max_workers=max_workers,
+    )
+    for result in summary['results']:
+        if result['error']:
+            logger.error(f"{result['account']}: {result['error']}")
+        else:
+            logger.info(f"{result['account']}: {result['inserted']} records added, {result['updated']} updated, {result['unchanged']} unchanged.")
+    totals = summary['totals']
+    logger.info(f"{totals['accounts']} accounts synced ({totals['failed']} failed), {totals['inserted']} records added.")
@@ -1,11 +1,24 @@
+import base64
 import json
+import os
+import threading
+import time
 import urllib3
 from .logger import setup_logger
-
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from .metrics import get_metrics
 
 logger = setup_logger('auth_logger', 'pocketcasts_errors.log')
 
+try:
+    import fcntl
+except ImportError: # Windows: fall back to in-process locking only.
+    fcntl = None
+
+# Used when the token does not carry its own expiry.
+DEFAULT_TOKEN_TTL = 3600
+# Tokens this close to expiring are treated as expired.
+EXPIRY_MARGIN = 60
+
 def do_login(http, user, pw):
     if not user or not pw:
         logger.error("Username or password not provided.")
@@ -24,7 +37,7 @@ def do_login(http, user, pw):
         response_data = json.loads(response.data)
         token = response_data["token"]
         return token
-    except (urllib3.exceptions.MaxRetryError, urllib3.exceptions.NewConnectionError) as e:
+    except urllib3.exceptions.HTTPError as e:
         logger.error(f"Network error during login: {e}")
         return None
     except KeyError:
@@ -40,3 +53,121 @@ def do_login(http, user, pw):
 
 def create_auth_headers(token):
     return {"Authorization": f"Bearer {token}"}
+
+
+def token_expiry(token, default_ttl=DEFAULT_TOKEN_TTL) -> float:
+    """Reads the exp claim when the token is a JWT, otherwise assumes
+    default_ttl seconds from now."""
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))['exp'])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return time.time() + default_ttl
+
+
+class TokenCache():
+    """File-backed cache of bearer tokens keyed by user. Logins are
+    single-flight: threads share a per-user lock, and processes sharing the
+    cache file serialize on a lock file next to it."""
+    def __init__(self, path=None, default_ttl=DEFAULT_TOKEN_TTL):
+        self.path = path
+        self.default_ttl = default_ttl
+        self.tokens = {}
+        self.lock = threading.Lock()
+        self.user_locks = {}
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                self.tokens = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Could not read token cache {self.path}: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            temp_path = f'{self.path}.tmp'
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump(self.tokens, file)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.error(f"Could not write token cache {self.path}: {e}")
+
+    def _user_lock(self, user):
+        with self.lock:
+            return self.user_locks.setdefault(user, threading.Lock())
+
+    def _file_lock(self):
+        if not self.path or fcntl is None:
+            return None
+        lock_file = open(f'{self.path}.lock', 'w')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def get(self, user):
+        with self.lock:
+            self._load()
+            entry = self.tokens.get(user)
+        if entry and entry['expires_at'] - EXPIRY_MARGIN > time.time():
+            return entry['token']
+        return None
+
+    def set(self, user, token):
+        with self.lock:
+            self._load()
+            self.tokens[user] = { 'token': token, 'expires_at': token_expiry(token, self.default_ttl) }
+            self._save()
+
+    def invalidate(self, user, token=None):
+        """Drops the cached token, unless another worker already replaced
+        the stale token passed in."""
+        with self.lock:
+            self._load()
+            entry = self.tokens.get(user)
+            if entry and (token is None or entry['token'] == token):
+                del self.tokens[user]
+                self._save()
+
+    def get_token(self, http, user, pw):
+        token = self.get(user)
+        if token:
+            return token
+
+        with self._user_lock(user):
+            lock_file = self._file_lock()
+            try:
+                # Another worker may have logged in while we waited.
+                token = self.get(user)
+                if token:
+                    return token
+
+                with get_metrics().timer('stage_seconds', stage='login'):
+                    token = do_login(http, user, pw)
+                if token:
+                    self.set(user, token)
+                return token
+            finally:
+                if lock_file:
+                    lock_file.close()
+
+
+class CachedLogin():
+    """Token source for PocketCastsClient that reuses cached tokens and logs
+    in again only when the API rejects the current one."""
+    def __init__(self, http, user, pw, cache=None):
+        self.http = http
+        self.user = user
+        self.pw = pw
+        self.cache = cache or TokenCache()
+
+    def token(self):
+        return self.cache.get_token(self.http, self.user, self.pw)
+
+    def refresh(self, stale_token):
+        self.cache.invalidate(self.user, stale_token)
+        return self.token()
@@ -0,0 +1,112 @@
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import urllib3
+
+from .logger import setup_logger
+
+logger = setup_logger('backfill_logger', 'pocketcasts_errors.log')
+
+DEFAULT_MAX_WORKERS = 16
+DEFAULT_BATCH_SIZE = 200
+# Hosts that could not be reached in this many batches in a row are skipped
+# for HOST_COOLDOWN seconds.
+MAX_HOST_FAILURES = 3
+HOST_COOLDOWN = 24 * 3600
+# A URL that answers without a size waits URL_COOLDOWN before it is tried
+# again, doubling with every failure up to MAX_URL_COOLDOWN.
+URL_COOLDOWN = 3600
+MAX_URL_COOLDOWN = 30 * 24 * 3600
+TIMEOUT = urllib3.Timeout(connect=5.0, read=10.0)
+
+CONTENT_RANGE = re.compile(r'bytes\s+\d+-\d+/(\d+)')
+
+def fetch_size(http, url: str) -> int:
+    """Returns the byte size of a remote file without downloading it. Tries
+    a HEAD request first, then a one-byte Range request for hosts that omit
+    Content-Length on HEAD. Raises ValueError when neither gives a size."""
+    response = http.request('HEAD', url, timeout=TIMEOUT, preload_content=False)
+    response.release_conn()
+    length = response.headers.get('Content-Length')
+    if response.status == 200 and length and int(length) > 0:
+        return int(length)
+
+    response = http.request('GET', url, headers={ 'Range': 'bytes=0-0' }, timeout=TIMEOUT, preload_content=False)
+    # Never read the body: a host that ignores Range would send the whole file.
+    response.close()
+    response.release_conn()
+
+    match = CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+    if response.status == 206 and match:
+        return int(match.group(1))
+    length = response.headers.get('Content-Length')
+    if response.status == 200 and length and int(length) > 0:
+        return int(length)
+
+    raise ValueError(f'No size in response (status {response.status})')
+
+def _fetch(http, row):
+    """Returns (id, url, size, error, host_error). host_error is set when
+    the host could not be reached at all, as opposed to answering without
+    a size for this one URL."""
+    id, url = row
+    try:
+        return id, url, fetch_size(http, url), None, False
+    except urllib3.exceptions.HTTPError as e:
+        return id, url, None, str(e), True
+    except Exception as e:
+        return id, url, None, str(e), False
+
+def run_backfill(store, http=None, max_workers: int = DEFAULT_MAX_WORKERS, batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """Fills in Size for rows saved with 0. Rows are read in ID order a
+    batch at a time and each batch is written in one transaction, so an
+    interrupted run picks up where it left off."""
+    http = http or urllib3.PoolManager(num_pools=max_workers * 2, maxsize=2)
+    summary = { 'updated': 0, 'failed': 0, 'skipped': 0 }
+    now = time.time()
+    failed_hosts = store.get_failed_hosts(MAX_HOST_FAILURES, now)
+    failed_urls = store.get_failed_urls(now)
+    after_id = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            rows = store.get_zero_size_records(batch_size, after_id)
+            if not rows:
+                break
+            after_id = rows[-1][0]
+
+            pending = [
+                row for row in rows if urlsplit(row[1]).hostname not in failed_hosts and row[1] not in failed_urls
+            ]
+            summary['skipped'] += len(rows) - len(pending)
+
+            sizes = []
+            host_failures = {}
+            url_failures = {}
+            successes = set()
+            for id, url, size, error, host_error in executor.map(lambda row: _fetch(http, row), pending):
+                host = urlsplit(url).hostname
+                if error:
+                    logger.error(f'Could not get size of {url}: {error}')
+                    if host_error:
+                        host_failures[host] = error
+                    else:
+                        url_failures[url] = error
+                    summary['failed'] += 1
+                else:
+                    sizes.append((id, size))
+                    successes.add(host)
+
+            summary['updated'] += store.update_sizes(sizes)
+            store.record_host_results(host_failures, successes, now, HOST_COOLDOWN)
+            store.record_url_failures(url_failures, now, URL_COOLDOWN, MAX_URL_COOLDOWN)
+
+    return summary
+
+if __name__ == "__main__":
+    import sys
+    from .cli import main
+
+    sys.exit(main(['backfill', *sys.argv[1:]]))
@@ -0,0 +1,160 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .logger import setup_logger
+from .metrics import get_metrics
+from .pocketcasts import APIError
+
+logger = setup_logger('catalog_logger', 'pocketcasts_errors.log')
+
+# Podcasts older than this are revalidated with a conditional request.
+DEFAULT_MAX_AGE = 24 * 3600
+DEFAULT_LRU_SIZE = 256
+
+class LRUCache():
+    def __init__(self, size: int):
+        self.size = size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.items:
+                return None
+            self.items.move_to_end(key)
+            return self.items[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+class Catalog():
+    """Serves title -> UUID and UUID -> metadata lookups for podcast
+    episodes from memory, then the Podcasts/Episodes tables, and only goes
+    to the network when a podcast is unknown or older than max_age. Stale
+    podcasts are revalidated with If-None-Match/If-Modified-Since, so an
+    unchanged podcast costs a 304 with no body."""
+    def __init__(self, client, store, max_age: float = DEFAULT_MAX_AGE, lru_size: int = DEFAULT_LRU_SIZE):
+        self.client = client
+        self.store = store
+        self.max_age = max_age
+        self.podcast_cache = LRUCache(lru_size)
+        self.episode_cache = LRUCache(lru_size * 16)
+
+    def _fetch(self, podcast_uuid: str, podcast: dict):
+        """Network half of a refresh, safe to run on worker threads.
+        Returns (status, document, etag, last_modified)."""
+        podcast = podcast or {}
+        try:
+            response = self.client.get_podcast_response(
+                podcast_uuid, etag=podcast.get('etag'), last_modified=podcast.get('last_modified')
+            )
+        except APIError:
+            return None, None, None, None
+        if response.status == 304:
+            return 304, None, None, None
+        if response.status != 200:
+            logger.error(f'Unexpected status {response.status} fetching podcast {podcast_uuid}.')
+            return response.status, None, None, None
+
+        try:
+            document = json.loads(response.data)['podcast']
+        except (json.JSONDecodeError, KeyError, TypeError):
+            logger.error(f'Unexpected response structure fetching podcast {podcast_uuid}.')
+            return None, None, None, None
+
+        return 200, document, response.headers.get('ETag'), response.headers.get('Last-Modified')
+
+    def _apply(self, podcast_uuid: str, result, now: float) -> bool:
+        """Database half of a refresh; runs on the caller's thread."""
+        status, document, etag, last_modified = result
+        if status == 304:
+            self.store.touch_podcast(podcast_uuid, now)
+            get_metrics().increment('catalog_refreshes_total', result='not_modified')
+            return True
+        if status != 200:
+            get_metrics().increment('catalog_refreshes_total', result='failed')
+            return False
+
+        document['uuid'] = podcast_uuid
+        self.store.save_podcast(document, document.get('episodes', []), etag, last_modified, now)
+        self.podcast_cache.discard(podcast_uuid)
+        for episode in document.get('episodes', []):
+            self.episode_cache.discard(episode['uuid'])
+        get_metrics().increment('catalog_refreshes_total', result='updated')
+        return True
+
+    def is_fresh(self, podcast: dict, now: float) -> bool:
+        return bool(podcast) and now - podcast['date_fetched'] < self.max_age
+
+    def refresh(self, podcast_uuid: str, force: bool = False) -> bool:
+        now = time.time()
+        podcast = self.store.get_podcast(podcast_uuid)
+        if not force and self.is_fresh(podcast, now):
+            return True
+        return self._apply(podcast_uuid, self._fetch(podcast_uuid, podcast), now)
+
+    def refresh_many(self, podcast_uuids: list[str], max_workers: int = 8, force: bool = False) -> dict:
+        """Refreshes stale podcasts concurrently. Returns counts of podcasts
+        that were fresh, refreshed, or failed."""
+        now = time.time()
+        summary = { 'fresh': 0, 'refreshed': 0, 'failed': 0 }
+        stale = []
+        for podcast_uuid in podcast_uuids:
+            podcast = self.store.get_podcast(podcast_uuid)
+            if not force and self.is_fresh(podcast, now):
+                summary['fresh'] += 1
+            else:
+                stale.append((podcast_uuid, podcast))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(lambda item: self._fetch(*item), stale)
+            for (podcast_uuid, _), result in zip(stale, results):
+                summary['refreshed' if self._apply(podcast_uuid, result, now) else 'failed'] += 1
+
+        return summary
+
+    def get_episodes(self, podcast_uuid: str) -> dict:
+        """Title -> episode UUID for a podcast, like PocketCastsClient.get_episodes."""
+        now = time.time()
+        # Entries carry their fetch time, so a memory hit needs no query.
+        cached = self.podcast_cache.get(podcast_uuid)
+        if cached is not None and now - cached[0] < self.max_age:
+            get_metrics().increment('catalog_lookups_total', source='memory')
+            return cached[1]
+
+        podcast = self.store.get_podcast(podcast_uuid)
+        if self.is_fresh(podcast, now):
+            get_metrics().increment('catalog_lookups_total', source='database')
+            date_fetched = podcast['date_fetched']
+        else:
+            get_metrics().increment('catalog_lookups_total', source='network')
+            # Failed refreshes are not cached, so the next lookup retries.
+            date_fetched = now if self._apply(podcast_uuid, self._fetch(podcast_uuid, podcast), now) else None
+
+        episodes = self.store.get_podcast_episodes(podcast_uuid)
+        if date_fetched is not None:
+            self.podcast_cache.put(podcast_uuid, (date_fetched, episodes))
+        return episodes
+
+    def get_episode_uuid(self, podcast_uuid: str, title: str):
+        return self.get_episodes(podcast_uuid).get(title)
+
+    def get_episode(self, episode_uuid: str) -> dict:
+        """Metadata of an episode from any podcast already in the catalog."""
+        episode = self.episode_cache.get(episode_uuid)
+        if episode is None:
+            episode = self.store.get_episode(episode_uuid)
+            if episode:
+                self.episode_cache.put(episode_uuid, episode)
+        return episode
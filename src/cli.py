@@ -0,0 +1,210 @@
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+
+# Only the standard library is imported up front. Each command loads the
+# modules it needs through load(), so `--help` or `stats` never pays for
+# urllib3, dotenv or the API client, and --profile can time every import.
+
+DEFAULT_SAMPLE = 'tests/data7.json'
+
+class Profile():
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self.imports = {}
+
+    def load(self, *names):
+        """Imports modules by name, timing each one; names starting with a dot
+        are relative to this package. Returns a single module, or a tuple
+        when several names are given."""
+        modules = []
+        for name in names:
+            start = time.perf_counter()
+            modules.append(importlib.import_module(name, __package__))
+            self.imports.setdefault(name.lstrip('.'), time.perf_counter() - start)
+        return modules[0] if len(modules) == 1 else tuple(modules)
+
+    def report(self) -> str:
+        lines = ['Imports:']
+        for name, seconds in self.imports.items():
+            lines.append(f'  {name:<24} {seconds * 1000:8.1f} ms')
+
+        metrics = importlib.import_module('.metrics', __package__).get_metrics()
+        if hasattr(metrics, 'get_timers'):
+            for name, label in (('stage_seconds', 'stage'), ('http_request_seconds', 'endpoint')):
+                timers = metrics.get_timers(name)
+                if not timers:
+                    continue
+                lines.append('Stages:' if label == 'stage' else 'HTTP requests:')
+                for labels, (count, total) in sorted(timers.items()):
+                    lines.append(f"  {dict(labels).get(label, ''):<24} {total * 1000:8.1f} ms  ({count}x)")
+
+        lines.append(f'Total: {(time.perf_counter() - self.start) * 1000:.1f} ms')
+        return '\n'.join(lines)
+
+def open_store(profile: Profile, args):
+    sqlite_store, main = profile.load('.sqlite_store', '.main')
+    return sqlite_store.SQLiteStore(args.db or main.getDB_path())
+
+def run_sync(profile: Profile, args) -> int:
+    main = profile.load('.main')
+    logger = main.configure_logging()
+
+    # DEBUG_MODE is the older switch for loading the sample data.
+    sample = args.sample or (DEFAULT_SAMPLE if os.environ.get('DEBUG_MODE') == 'True' else None)
+    if not sample:
+        dotenv = profile.load('dotenv')
+        dotenv.load_dotenv()
+        for name in ('USERNAME', 'PASSWORD'):
+            if name not in os.environ:
+                logger.error(f'{name} environment variable was not found.')
+                return 1
+
+    shutdown_telemetry = main.configure_telemetry()
+    store = open_store(profile, args)
+    try:
+        if sample:
+            metrics = profile.load('.metrics').get_metrics()
+            logger.debug(f'Loading sample data from {sample}.')
+            with metrics.timer('stage_seconds', stage='decode'), open(sample, 'r', encoding='utf-8') as file:
+                episodes = json.load(file)['episodes']
+            with metrics.timer('stage_seconds', stage='insert'):
+                counts = store.upsert_records(episodes)
+        else:
+            auth, pocketcasts, sync, transport = profile.load('.auth', '.pocketcasts', '.sync', '.transport')
+            http = transport.create_transport()
+            login = auth.CachedLogin(
+                http, os.environ['USERNAME'], os.environ['PASSWORD'], auth.TokenCache(main.get_token_cache_path())
+            )
+            client = pocketcasts.PocketCastsClient(None, http, login=login)
+            if not client.token:
+                logger.error('Login failed.')
+                return 1
+            try:
+                counts = sync.sync_history(client, store, stream=args.stream)
+            except pocketcasts.APIError as e:
+                logger.error(f'Sync failed: {e}')
+                return 1
+    finally:
+        store.close()
+        shutdown_telemetry()
+
+    logger.info(f"{counts['inserted']} records added, {counts['updated']} updated, {counts['unchanged']} unchanged.")
+    return 0
+
+def run_export(profile: Profile, args) -> int:
+    main, export = profile.load('.main', '.export')
+    logger = main.configure_logging()
+    store = open_store(profile, args)
+    try:
+        summary = export.export_history(store, args.directory, args.format, args.incremental, args.name, args.batch_size)
+    finally:
+        store.close()
+
+    if summary['path']:
+        logger.info(f"{summary['rows']} records exported to {summary['path']}.")
+    else:
+        logger.info('No new records to export.')
+    return 0
+
+def run_stats(profile: Profile, args) -> int:
+    stats, sqlite_store = profile.load('.stats', '.sqlite_store')
+    dimensions = [ dimension for dimension in sqlite_store.STATS_DIMENSIONS if dimension != 'total' ]
+    store = open_store(profile, args)
+    try:
+        report = stats.build_report(store, args.by or dimensions, args.limit, args.order_by)
+    finally:
+        store.close()
+
+    print(stats.format_report(report))
+    return 0
+
+def run_search(profile: Profile, args) -> int:
+    search = profile.load('.search')
+    store = open_store(profile, args)
+    try:
+        results = search.search_history(store, ' '.join(args.query), max(args.page, 1), args.page_size, not args.exact)
+    finally:
+        store.close()
+
+    for row in results['rows']:
+        print(search.format_result(row))
+    print(f"Page {results['page']} of {max(results['pages'], 1)}, {results['total']} matches.")
+    return 0
+
+def run_backfill(profile: Profile, args) -> int:
+    main, backfill = profile.load('.main', '.backfill')
+    logger = main.configure_logging()
+    store = open_store(profile, args)
+    try:
+        summary = backfill.run_backfill(store, max_workers=args.max_workers, batch_size=args.batch_size)
+    finally:
+        store.close()
+
+    logger.info(f"{summary['updated']} sizes updated, {summary['failed']} failed, {summary['skipped']} skipped.")
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    # Defaults are repeated here rather than imported, which would load the
+    # modules this file keeps off the startup path.
+    parser = argparse.ArgumentParser(prog='pocketcasts-store', description='Cache Pocket Casts listening history.')
+    parser.add_argument('--profile', action='store_true', help='print import and stage timings to stderr')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_command(name, handler, help):
+        command = commands.add_parser(name, help=help, description=help)
+        command.add_argument('--db', default=None, help='database file (defaults to the sync database)')
+        command.set_defaults(handler=handler)
+        return command
+
+    sync = add_command('sync', run_sync, 'Fetch new listening history and save it.')
+    sync.add_argument('--stream', action='store_true', help='decode the history while it downloads')
+    sync.add_argument('--sample', nargs='?', const=DEFAULT_SAMPLE, default=None,
+                      help=f'save a history file instead of calling the API (default {DEFAULT_SAMPLE})')
+
+    export = add_command('export', run_export, 'Export the listening history to a compressed file.')
+    export.add_argument('directory', help='directory to write the export to')
+    export.add_argument('--format', choices=('auto', 'parquet', 'arrow', 'csv', 'ndjson'), default='auto',
+                        help='auto writes parquet when pyarrow is installed, csv otherwise')
+    export.add_argument('--incremental', action='store_true', help='only export rows saved since the last export')
+    export.add_argument('--name', default='listening_history', help='file name prefix and watermark name')
+    export.add_argument('--batch-size', type=int, default=10000, help='rows read and written at a time')
+
+    stats = add_command('stats', run_stats, 'Report listening statistics from the precomputed rollups.')
+    stats.add_argument('--by', choices=('podcast', 'author', 'month'), action='append',
+                       help='rollups to show (default: all)')
+    stats.add_argument('--limit', type=int, default=10, help='rows per rollup')
+    stats.add_argument('--order-by', choices=('listens', 'starred', 'duration', 'bytes'), default='listens')
+
+    search = add_command('search', run_search, 'Search the listening history by title, podcast or author.')
+    search.add_argument('query', nargs='+', help='words to search for; every word must match')
+    search.add_argument('--page', type=int, default=1, help='page of results to show, starting at 1')
+    search.add_argument('--page-size', type=int, default=20, help='results per page')
+    search.add_argument('--exact', action='store_true', help='match whole words only, not prefixes')
+
+    backfill = add_command('backfill', run_backfill, 'Fill in missing episode sizes without downloading audio.')
+    backfill.add_argument('--max-workers', type=int, default=16, help='concurrent size requests')
+    backfill.add_argument('--batch-size', type=int, default=200, help='rows read and updated at a time')
+
+    return parser
+
+def main(argv=None) -> int:
+    profile = Profile()
+    args = build_parser().parse_args(argv)
+    profile.enabled = args.profile
+    if profile.enabled:
+        profile.load('.metrics').configure_metrics(None, in_memory=True)
+
+    try:
+        return args.handler(profile, args)
+    finally:
+        if profile.enabled:
+            print(profile.report(), file=sys.stderr)
+            profile.load('.metrics').configure_metrics(None)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote
+
+# PRAGMA settings applied to every connection. journal_mode is persistent in
+# the database file, the rest are per connection.
+PROFILES = {
+    # SQLite defaults: rollback journal, synchronous=FULL.
+    'default': {
+        'busy_timeout': 5000,
+    },
+    # WAL lets readers and the writer work concurrently. synchronous=NORMAL
+    # is durable across application crashes and only risks the most recent
+    # transactions on power loss.
+    'performance': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -64000, # KiB, i.e. 64MB
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+    },
+    # WAL concurrency without giving up synchronous=FULL.
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+    },
+}
+DEFAULT_PROFILE = os.environ.get('SQLITE_PROFILE', 'performance')
+DEFAULT_READERS = 4
+
+def apply_profile(connection: sqlite3.Connection, pragmas: dict, read_only=False):
+    for name, value in pragmas.items():
+        # Read-only connections cannot change the journal mode.
+        if read_only and name in ('journal_mode', 'synchronous'):
+            continue
+        connection.execute(f'PRAGMA {name} = {value}')
+
+class ConnectionManager():
+    """Owns one writer connection and a pool of read-only connections, so
+    queries never wait behind an ingest and the reverse (in WAL mode)."""
+    def __init__(self, db_name: str, profile: str = DEFAULT_PROFILE, readers: int = DEFAULT_READERS):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown SQLite profile '{profile}'. Choose one of: {', '.join(PROFILES)}")
+
+        self.db_name = db_name
+        self.pragmas = PROFILES[profile]
+        self.readers = readers
+        # An in-memory database is private to its connection, so reads have
+        # to go through the writer.
+        self.in_memory = db_name == ':memory:' or db_name.startswith('file::memory:')
+        self.writer = sqlite3.connect(db_name)
+        apply_profile(self.writer, self.pragmas)
+        self.reader_pool = queue.LifoQueue()
+        self.opened_readers = 0
+        self.lock = threading.Lock()
+
+    def _open_reader(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(f'file:{quote(self.db_name)}?mode=ro', uri=True, check_same_thread=False)
+        apply_profile(connection, self.pragmas, read_only=True)
+        return connection
+
+    @contextmanager
+    def reader(self):
+        """Borrows a read-only connection. Readers are opened lazily, up to
+        the pool size, after which callers wait for one to be returned."""
+        if self.in_memory or not self.readers:
+            yield self.writer
+            return
+
+        try:
+            connection = self.reader_pool.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                can_open = self.opened_readers < self.readers
+                if can_open:
+                    self.opened_readers += 1
+            connection = self._open_reader() if can_open else self.reader_pool.get()
+
+        try:
+            yield connection
+        finally:
+            # Never return a reader with an open read transaction.
+            if connection.in_transaction:
+                connection.rollback()
+            self.reader_pool.put(connection)
+
+    def close(self):
+        while True:
+            try:
+                self.reader_pool.get_nowait().close()
+            except queue.Empty:
+                break
+        self.writer.close()
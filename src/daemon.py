@@ -0,0 +1,118 @@
+import os
+import random
+import signal
+import sys
+import threading
+
+from dotenv import load_dotenv
+
+from .auth import CachedLogin, TokenCache
+from .main import configure_logging, configure_telemetry, getDB_path, get_token_cache_path
+from .metrics import serve_prometheus
+from .pocketcasts import PocketCastsClient
+from .sqlite_store import SQLiteStore
+from .sync import sync_history
+from .transport import create_transport
+
+DEFAULT_INTERVAL = 3600
+DEFAULT_JITTER = 60
+
+class Scheduler():
+    def __init__(self, interval: float, jitter: float = 0, max_backoff: float = None, stop_event=None, logger=None):
+        self.interval = interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff if max_backoff is not None else interval * 8
+        self.stop_event = stop_event or threading.Event()
+        self.logger = logger
+        self.failures = 0
+
+    def next_delay(self) -> float:
+        """Waits one interval after a success and doubles the wait for each
+        consecutive failure, up to max_backoff. Jitter spreads out many
+        daemons started at the same moment."""
+        delay = self.interval
+        if self.failures:
+            delay = min(self.interval * 2 ** self.failures, max(self.max_backoff, self.interval))
+
+        return delay + random.uniform(0, self.jitter)
+
+    def run(self, job):
+        while not self.stop_event.is_set():
+            try:
+                job()
+                self.failures = 0
+            except Exception as e:
+                self.failures += 1
+                if self.logger:
+                    self.logger.error(f'Sync cycle failed ({self.failures} in a row): {e}')
+
+            self.stop_event.wait(self.next_delay())
+
+    def stop(self, *args):
+        self.stop_event.set()
+
+class SyncJob():
+    """Holds the connection pool, auth token and database connection
+    between cycles so each one only pays for the sync itself."""
+    def __init__(self, http, store, login, logger, stream=False):
+        self.http = http
+        self.store = store
+        self.login = login
+        self.logger = logger
+        self.stream = stream
+        self.client = None
+
+    def __call__(self):
+        if self.client is None or not self.client.token:
+            self.client = PocketCastsClient(None, self.http, login=self.login)
+            if not self.client.token:
+                raise RuntimeError('Login failed.')
+
+        counts = sync_history(self.client, self.store, stream=self.stream)
+        self.logger.info(f"{counts['inserted']} records added, {counts['updated']} updated, {counts['unchanged']} unchanged.")
+        return counts
+
+def run_daemon():
+    logger = configure_logging()
+
+    load_dotenv()
+    shutdown_telemetry = configure_telemetry()
+    if not 'USERNAME' in os.environ:
+        logger.error('USERNAME environment variable was not found.')
+        sys.exit()
+    if not 'PASSWORD' in os.environ:
+        logger.error('PASSWORD environment variable was not found.')
+        sys.exit()
+
+    interval = float(os.environ.get('SYNC_INTERVAL', DEFAULT_INTERVAL))
+    jitter = float(os.environ.get('SYNC_JITTER', DEFAULT_JITTER))
+    max_backoff = float(os.environ['SYNC_MAX_BACKOFF']) if 'SYNC_MAX_BACKOFF' in os.environ else None
+
+    http = create_transport()
+    store = SQLiteStore(getDB_path())
+    login = CachedLogin(
+        http, os.environ.get('USERNAME'), os.environ.get('PASSWORD'), TokenCache(get_token_cache_path())
+    )
+    job = SyncJob(http, store, login, logger, stream=os.environ.get('SYNC_STREAM') == 'True')
+    scheduler = Scheduler(interval, jitter, max_backoff, logger=logger)
+
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+
+    metrics_server = None
+    if 'METRICS_PORT' in os.environ:
+        metrics_server = serve_prometheus(int(os.environ['METRICS_PORT']))
+
+    logger.info(f'Starting sync daemon with a {interval}s interval.')
+    try:
+        scheduler.run(job)
+    finally:
+        store.close()
+        http.clear()
+        if metrics_server:
+            metrics_server.shutdown()
+        logger.info('Sync daemon stopped.')
+        shutdown_telemetry()
+
+if __name__ == "__main__":
+    run_daemon()
@@ -0,0 +1,153 @@
+import csv
+import gzip
+import itertools
+import json
+import os
+import sys
+import time
+
+from .logger import setup_logger
+from .sqlite_store import FULL_COLUMNS, SQLiteStore
+
+logger = setup_logger('export_logger', 'pocketcasts_errors.log')
+
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_NAME = 'listening_history'
+EXTENSIONS = {
+    'parquet': 'parquet',
+    'arrow': 'arrow',
+    'csv': 'csv.gz',
+    'ndjson': 'ndjson.gz',
+}
+# Formats that need pyarrow, and what to write instead when it is missing.
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+FALLBACK_FORMAT = 'csv'
+
+def load_pyarrow():
+    """pyarrow is optional and slow to import, so it is only loaded when a
+    columnar export is requested."""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        return None
+    return pyarrow
+
+def resolve_format(file_format: str = 'auto') -> str:
+    if file_format not in ('auto',) + tuple(EXTENSIONS):
+        raise ValueError(f"Unknown export format '{file_format}'. Choose one of: auto, {', '.join(EXTENSIONS)}")
+    if file_format == 'auto' or file_format in COLUMNAR_FORMATS:
+        if load_pyarrow():
+            return 'parquet' if file_format == 'auto' else file_format
+        if file_format != 'auto':
+            logger.warning(f'pyarrow is not installed, exporting {FALLBACK_FORMAT} instead of {file_format}.')
+        return FALLBACK_FORMAT
+    return file_format
+
+def arrow_schema(pyarrow):
+    types = {
+        'ID': pyarrow.int64(),
+        'Duration': pyarrow.int64(),
+        'Size': pyarrow.int64(),
+        'Is_Starred': pyarrow.bool_(),
+    }
+    return pyarrow.schema([ (column, types.get(column, pyarrow.string())) for column in FULL_COLUMNS ])
+
+def write_columnar(batches, path: str, file_format: str) -> int:
+    """Writes each batch as one Arrow record batch (one Parquet row group),
+    zstd-compressed, so only a single batch is ever held in memory."""
+    pyarrow = load_pyarrow()
+    schema = arrow_schema(pyarrow)
+    if file_format == 'parquet':
+        writer = pyarrow.parquet.ParquetWriter(path, schema, compression='zstd')
+    else:
+        writer = pyarrow.ipc.new_file(path, schema, options=pyarrow.ipc.IpcWriteOptions(compression='zstd'))
+
+    rows = 0
+    try:
+        for batch in batches:
+            columns = list(zip(*batch))
+            starred = FULL_COLUMNS.index('Is_Starred')
+            columns[starred] = [ bool(value) for value in columns[starred] ]
+            writer.write_batch(pyarrow.RecordBatch.from_arrays(
+                [ pyarrow.array(column, type=field.type) for column, field in zip(columns, schema) ], schema=schema
+            ))
+            rows += len(batch)
+    finally:
+        writer.close()
+    return rows
+
+def write_text(batches, path: str, file_format: str) -> int:
+    rows = 0
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as file:
+        if file_format == 'csv':
+            writer = csv.writer(file)
+            writer.writerow(FULL_COLUMNS)
+            for batch in batches:
+                writer.writerows(batch)
+                rows += len(batch)
+        else:
+            for batch in batches:
+                file.writelines(json.dumps(dict(zip(FULL_COLUMNS, row))) + '\n' for row in batch)
+                rows += len(batch)
+    return rows
+
+def export_path(directory: str, name: str, file_format: str) -> str:
+    """Timestamped file name, never overwriting an earlier export."""
+    stem = os.path.join(directory, f"{name}-{time.strftime('%Y%m%dT%H%M%S')}")
+    path = f'{stem}.{EXTENSIONS[file_format]}'
+    copy = 1
+    while os.path.exists(path):
+        path = f'{stem}-{copy}.{EXTENSIONS[file_format]}'
+        copy += 1
+    return path
+
+def export_history(store: SQLiteStore, directory: str, file_format: str = 'auto', incremental: bool = False,
+                   name: str = DEFAULT_NAME, batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """Streams Listening_History, oldest first, into a new file in directory.
+    With incremental, only rows saved after the last export under the same
+    name are written, and path is None when there are none. The watermark
+    only moves once the file is complete, so a failed export is simply
+    retried by the next run."""
+    file_format = resolve_format(file_format)
+    after = store.get_export_watermark(name) if incremental else None
+    last_key = []
+
+    def batches():
+        for batch in store.iter_records(batch_size, after=after, descending=False):
+            last_key[:] = [batch[-1][-1], batch[-1][0]]
+            yield batch
+
+    # An incremental run with nothing new writes no file, so nightly exports
+    # do not pile up empty ones.
+    pending = batches()
+    first = next(pending, None)
+    if first is None and incremental:
+        return { 'path': None, 'format': file_format, 'rows': 0, 'watermark': after }
+    pending = itertools.chain([first] if first else [], pending)
+    path = export_path(directory, name, file_format)
+
+    os.makedirs(directory, exist_ok=True)
+    writer = write_columnar if file_format in COLUMNAR_FORMATS else write_text
+    try:
+        rows = writer(pending, path + '.tmp', file_format)
+        os.replace(path + '.tmp', path)
+    except BaseException:
+        if os.path.exists(path + '.tmp'):
+            os.remove(path + '.tmp')
+        raise
+
+    watermark = tuple(last_key) or after
+    if watermark:
+        store.set_export_watermark(name, watermark, rows)
+
+    return { 'path': path, 'format': file_format, 'rows': rows, 'watermark': watermark }
+
+def main(argv=None) -> int:
+    # The arguments are defined once, in the cli module.
+    from .cli import main as cli_main
+    return cli_main(['export', *(sys.argv[1:] if argv is None else argv)])
+
+if __name__ == '__main__':
+    sys.exit(main())
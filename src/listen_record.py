@@ -1,4 +1,18 @@
+from operator import itemgetter
+
+# API dictionary keys in constructor order.
+_DICTIONARY_FIELDS = itemgetter(
+    'uuid', 'url', 'published', 'duration', 'title', 'size', 'starred', 'podcastUuid', 'podcastTitle', 'author'
+)
+
 class ListenRecord:
+    # No per-instance __dict__: a loaded archive can hold hundreds of
+    # thousands of these.
+    __slots__ = (
+        'id', 'episode_uuid', 'url', 'published_date', 'duration', 'title', 'size',
+        'is_starred', 'podcast_uuid', 'podcast_title', 'author', 'date_added'
+    )
+
     def __init__(self, episode_uuid, url, published_date, duration,
                  title, size, is_starred, podcast_uuid, podcast_title,
                  author, date_added = '', id = None
@@ -18,50 +32,43 @@ class ListenRecord:
 
     @classmethod
     def Convert_List(cls, source_list):
-        packaged_list = []
-
-        for row in source_list:
-            packaged_list.append(ListenRecord.From_Row_List(row))
-        
-        return packaged_list
+        # Rows are (ID, ...fields..., Date_Saved); the constructor takes ID last.
+        return [ cls(*row[1:], row[0]) for row in source_list ]
 
     @classmethod
     def From_Dictionary(cls, source_dictionary):
-        episode_uuid = source_dictionary['uuid']
-        url = source_dictionary['url']
-        published_date = source_dictionary['published']
-        duration = source_dictionary['duration']
-        title = source_dictionary['title']
-        size = source_dictionary['size']
-        is_starred = source_dictionary['starred']
-        podcast_uuid = source_dictionary['podcastUuid']
-        podcast_title = source_dictionary['podcastTitle']
-        author = source_dictionary['author']
+        return cls(*_DICTIONARY_FIELDS(source_dictionary))
 
-        return cls(episode_uuid, url, published_date, duration, title, size, is_starred, podcast_uuid, podcast_title, author)
+    @classmethod
+    def From_Dictionaries(cls, source_dictionaries):
+        return [ cls(*_DICTIONARY_FIELDS(source)) for source in source_dictionaries ]
 
     @classmethod
     def From_Row_List(cls, source_list):
         id, episode_uuid, url, published_date, duration, title, size, is_starred, podcast_uuid, podcast_title, author, date_added = source_list
-        
+
         return cls(episode_uuid, url, published_date, duration, title, size, is_starred, podcast_uuid, podcast_title, author, date_added, id)
-    
+
+    @classmethod
+    def Row_Factory(cls, cursor, row):
+        """sqlite3 row_factory for full Listening_History rows, so records are
+        built straight from the cursor without intermediate tuples."""
+        return cls(*row[1:], row[0])
+
+    def _key(self):
+        return (self.episode_uuid, self.url, self.published_date, self.duration, self.title,
+                self.size, self.is_starred, self.podcast_uuid, self.podcast_title, self.author)
+
     def __eq__(self, other):
         if isinstance(other, ListenRecord):
-            return (self.episode_uuid == other.episode_uuid and
-                    self.url == other.url and
-                    self.published_date == other.published_date and
-                    self.duration == other.duration and
-                    self.title == other.title and
-                    self.size == other.size and 
-                    self.is_starred == other.is_starred and
-                    self.podcast_uuid == other.podcast_uuid and
-                    self.podcast_title == other.podcast_title and
-                    self.author == other.author)
-        
+            return self._key() == other._key()
+
         return False
-    
+
+    def __hash__(self):
+        return hash(self.episode_uuid)
+
     def __repr__(self):
         return 'ListenRecord\n - ID: {}\n - Episode UUID: {}\n - URL: {}\n - Published Date: {}\n - Duration: {}\n - Title: {}\n - Size: {}\n - Is Starred: {}\n - Podcast UUID: {}\n - Podcast Title: {}\n - Author: {}\n - Date Added: {}'.format(
             self.id, self.episode_uuid, self.url, self.published_date, self.duration, self.title, self.size, self.is_starred, self.podcast_uuid, self.podcast_title, self.author, self.date_added
-        )
\ No newline at end of file
+        )
@@ -1,21 +1,78 @@
 import logging
+import logging.handlers
+import queue
+import sqlite3
 import sys
 
 def setup_logger(name, log_file, level=logging.INFO):
     """Function to setup as many loggers as you want"""
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    # Loggers are module globals; don't stack handlers if set up twice.
+    if logger.handlers:
+        return logger
+
     formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
 
-    # Handler for logging to file
-    file_handler = logging.FileHandler(log_file)
+    # Handler for logging to file. delay=True leaves the file unopened until
+    # the first record, so importing a module costs no file I/O.
+    file_handler = logging.FileHandler(log_file, delay=True)
     file_handler.setFormatter(formatter)
 
     # Handler for logging to stdout
     stdout_handler = logging.StreamHandler(sys.stdout)
     stdout_handler.setFormatter(formatter)
 
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
     logger.addHandler(file_handler)
     logger.addHandler(stdout_handler)
 
     return logger
+
+class SQLiteHandler(logging.Handler):
+    """Writes log records to a Logs table. Meant to run behind a
+    QueueListener, which calls it from a single background thread."""
+    def __init__(self, db_path, level=logging.NOTSET):
+        super().__init__(level)
+        self.db_path = db_path
+        self.connection = None
+        with sqlite3.connect(db_path) as connection:
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS Logs (
+                    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Logger TEXT NOT NULL,
+                    Level TEXT NOT NULL,
+                    Message TEXT NOT NULL,
+                    Date_Logged DATETIME DEFAULT CURRENT_TIMESTAMP)
+            ''')
+        connection.close()
+
+    def emit(self, record):
+        try:
+            if self.connection is None:
+                self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+            with self.connection:
+                self.connection.execute(
+                    'INSERT INTO Logs (Logger, Level, Message) VALUES (?, ?, ?)',
+                    (record.name, record.levelname, self.format(record))
+                )
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+        super().close()
+
+def enable_sqlite_logging(db_path, level=logging.INFO) -> logging.handlers.QueueListener:
+    """Copies every log record to db_path without blocking the caller: the
+    root logger only enqueues, a listener thread does the writes. Stop the
+    returned listener to flush and close."""
+    log_queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setLevel(level)
+    logging.getLogger().addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(log_queue, SQLiteHandler(db_path))
+    listener.start()
+    return listener
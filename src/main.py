@@ -1,13 +1,10 @@
+import logging
 import os
 import sys
-from dotenv import load_dotenv
-import json
-import logging
 
-from .auth import *
-from .pocketcasts import get_history
-from .sqlite_store import SQLiteStore
-    
+# Heavier modules are imported where they are used, so every entry point
+# that only needs the helpers below starts quickly.
+
 def diff_records(incoming: list[dict], existing: tuple) -> list:
     if not incoming:
         return [] # Return empty list instead of 0
@@ -30,21 +27,39 @@ def getDB_path():
 
     # confirm directory exists
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    try:
-        # Attempt to create a file to test write permissions
-        test_file = os.path.join(os.path.dirname(path), 'test_write.txt')
-        with open(test_file, 'w') as f:
-            f.write('test')
-        os.remove(test_file)
-    except PermissionError:
-        logger.error(f"Permission denied when trying to write to {os.path.dirname(path)}")
-        raise
-
-    return path 
+
+    return path
+
+def get_token_cache_path():
+    return os.environ.get(
+        'TOKEN_CACHE_PATH', os.path.join(os.path.dirname(getDB_path()), 'token_cache.json')
+    )
+
+def configure_telemetry():
+    """Sends metrics and a copy of all log records to METRICS_DB, a SQLite
+    file kept apart from the listening history. Returns a function that
+    flushes and stops both."""
+    metrics_db = os.environ.get('METRICS_DB')
+    if not metrics_db:
+        return lambda: None
+
+    from .logger import enable_sqlite_logging
+    from .metrics import configure_metrics
+
+    metrics = configure_metrics(metrics_db)
+    listener = enable_sqlite_logging(metrics_db)
+
+    def shutdown():
+        metrics.close()
+        listener.stop()
+
+    return shutdown
 
 def configure_logging() -> logging.Logger:
     logger = logging.getLogger('app')
     logger.setLevel(logging.DEBUG)
+    if logger.handlers:
+        return logger
 
     stdout_handler = logging.StreamHandler(sys.stdout)
     stdout_handler.setLevel(logging.DEBUG)
@@ -55,39 +70,6 @@ def configure_logging() -> logging.Logger:
     return logger
 
 if __name__ == "__main__":
-    CALL_API = False
-    LOAD_SAMPLE = True
-
-    logger = configure_logging()
-
-    # look for flag to load sample data
-    if 'DEBUG_MODE' in os.environ and os.environ.get('DEBUG_MODE') == 'True':
-        LOAD_SAMPLE = True
-        CALL_API = False
-        logger.debug('DEBUG_MODE is set to True. Loading sample data.')
-
-    # load credentials
-    load_dotenv()
-    if not 'USERNAME' in os.environ:
-        logger.error('USERNAME environment variable was not found.')
-        sys.exit()
-    if not 'PASSWORD' in os.environ:
-        logger.error('PASSWORD environment variable was not found.')
-        sys.exit()
-
-    if CALL_API:
-        http = urllib3.PoolManager(cert_reqs='CERT_NONE', assert_hostname=False)
-        token = do_login(http, user=os.environ.get('USERNAME'), pw=os.environ.get('PASSWORD'))
-        history = get_history(http, token)
-    
-    if LOAD_SAMPLE: # read sample json into memory
-        logger.debug('Loading sample data.')
-        with open('tests/data7.json', 'r', encoding='utf-8') as file:
-            history = json.load(file)
-
-    store = SQLiteStore(getDB_path())
-    saved_records = store.get_records()
-    new_records = diff_records(history['episodes'], saved_records)
-    store.save_records(new_records)
-    logger.info(f'{len(saved_records)} records added.')
-    store.close()
\ No newline at end of file
+    # Runs a sync when no subcommand is given, as this entry point always has.
+    from .cli import main
+    sys.exit(main(sys.argv[1:] or ['sync']))
@@ -0,0 +1,205 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+QUEUE_SIZE = 10000
+WRITE_BATCH_SIZE = 500
+PROMETHEUS_PREFIX = 'pocketcasts_'
+
+class NullMetrics():
+    """Default recorder: instrumentation costs almost nothing until
+    configure_metrics is called."""
+    def increment(self, name, value=1, **labels):
+        pass
+
+    def observe(self, name, seconds, **labels):
+        pass
+
+    @contextmanager
+    def timer(self, name, **labels):
+        yield
+
+    def render_prometheus(self) -> str:
+        return ''
+
+    def close(self):
+        pass
+
+class InMemoryMetrics(NullMetrics):
+    """Keeps running totals in memory only. Used on its own by --profile,
+    and as the base of MetricsRecorder, whose totals feed Prometheus."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.timers = {}
+        self.dropped = 0
+
+    def _put(self, name, kind, value, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if kind == 'counter':
+                self.counters[key] = self.counters.get(key, 0) + value
+            else:
+                count, total = self.timers.get(key, (0, 0.0))
+                self.timers[key] = (count + 1, total + value)
+
+    def increment(self, name, value=1, **labels):
+        self._put(name, 'counter', value, labels)
+
+    def observe(self, name, seconds, **labels):
+        self._put(name, 'timer', seconds, labels)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def get_timers(self, name) -> dict:
+        """Returns {labels: (count, total seconds)} recorded for name."""
+        with self.lock:
+            return { labels: value for (metric, labels), value in self.timers.items() if metric == name }
+
+    def render_prometheus(self) -> str:
+        def format_labels(labels):
+            if not labels:
+                return ''
+            return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+        lines = []
+        with self.lock:
+            counters = dict(self.counters)
+            timers = dict(self.timers)
+            dropped = self.dropped
+
+        for name in sorted({ key[0] for key in counters }):
+            lines.append(f'# TYPE {PROMETHEUS_PREFIX}{name} counter')
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{PROMETHEUS_PREFIX}{name}{format_labels(labels)} {value}')
+
+        for name in sorted({ key[0] for key in timers }):
+            lines.append(f'# TYPE {PROMETHEUS_PREFIX}{name} summary')
+            for (metric, labels), (count, total) in sorted(timers.items()):
+                if metric == name:
+                    lines.append(f'{PROMETHEUS_PREFIX}{name}_count{format_labels(labels)} {count}')
+                    lines.append(f'{PROMETHEUS_PREFIX}{name}_sum{format_labels(labels)} {total}')
+
+        lines.append(f'# TYPE {PROMETHEUS_PREFIX}metrics_dropped counter')
+        lines.append(f'{PROMETHEUS_PREFIX}metrics_dropped {dropped}')
+        return '\n'.join(lines) + '\n'
+
+class MetricsRecorder(InMemoryMetrics):
+    """Records counters and timings to a separate SQLite database. Callers
+    only put onto a bounded queue; a background thread does the writes, and
+    samples are dropped (and counted) rather than blocking a sync when the
+    queue is full. Running totals are also kept in memory for Prometheus."""
+    def __init__(self, db_path: str):
+        super().__init__()
+        self.db_path = db_path
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._create_database()
+        self.thread = threading.Thread(target=self._writer, name='metrics-writer', daemon=True)
+        self.thread.start()
+
+    def _create_database(self):
+        with sqlite3.connect(self.db_path) as connection:
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS Metrics (
+                    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Name TEXT NOT NULL,
+                    Kind TEXT NOT NULL CHECK (Kind IN ('counter', 'timer')),
+                    Value REAL NOT NULL,
+                    Labels TEXT NOT NULL DEFAULT '{}',
+                    Date_Recorded DATETIME DEFAULT CURRENT_TIMESTAMP)
+            ''')
+            connection.execute('''
+                CREATE INDEX IF NOT EXISTS idx_metrics_name_date ON Metrics (Name, Date_Recorded)
+            ''')
+        connection.close()
+
+    def _put(self, name, kind, value, labels):
+        super()._put(name, kind, value, labels)
+        try:
+            self.queue.put_nowait((name, kind, value, json.dumps(labels, sort_keys=True)))
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+
+    def _writer(self):
+        connection = sqlite3.connect(self.db_path)
+        running = True
+        while running:
+            rows = [self.queue.get()]
+            while len(rows) < WRITE_BATCH_SIZE:
+                try:
+                    rows.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            samples = [ row for row in rows if row is not None ]
+            running = len(samples) == len(rows)
+            if samples:
+                with connection:
+                    connection.executemany(
+                        'INSERT INTO Metrics (Name, Kind, Value, Labels) VALUES (?, ?, ?, ?)', samples
+                    )
+            for _ in rows:
+                self.queue.task_done()
+        connection.close()
+
+    def flush(self):
+        """Waits until everything queued so far has been written."""
+        self.queue.join()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+_metrics = NullMetrics()
+
+def get_metrics():
+    return _metrics
+
+def configure_metrics(db_path: str, in_memory: bool = False):
+    """Records to db_path, or only in memory with in_memory, or not at all."""
+    global _metrics
+    _metrics.close()
+    if db_path:
+        _metrics = MetricsRecorder(db_path)
+    else:
+        _metrics = InMemoryMetrics() if in_memory else NullMetrics()
+    return _metrics
+
+def serve_prometheus(port: int, host: str = '0.0.0.0'):
+    """Serves the current metrics as Prometheus text at /metrics from a
+    background thread. Call shutdown() on the result to stop it."""
+    # Only the daemon serves metrics; keep http.server off the CLI's startup path.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = get_metrics().render_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
@@ -0,0 +1,129 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .logger import setup_logger
+from .metrics import get_metrics
+from .pocketcasts import APIError
+
+logger = setup_logger('outbox_logger', 'pocketcasts_errors.log')
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_RATE = 5.0 # requests per second
+DEFAULT_BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 2.0
+RETRY_MAX_SECONDS = 300.0
+
+class RateLimiter():
+    """Token bucket shared by all workers. pause() stops every worker until
+    the given time, which is how a 429's Retry-After is honoured."""
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now >= self.paused_until:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    wait = self.paused_until - now
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+            self.updated = self.paused_until
+
+def retry_after(response, default: float) -> float:
+    try:
+        return max(0.0, float(response.headers.get('Retry-After')))
+    except (TypeError, ValueError):
+        return default
+
+def send_update(client, limiter: RateLimiter, payload: dict, retries: int = 2, backoff: float = 1.0):
+    """Sends one update, retrying 429s and server errors in place. Returns
+    (error, permanent): error is None on success, and permanent is set when
+    the API rejected the update, which no retry will change."""
+    error = None
+    for attempt in range(retries + 1):
+        limiter.acquire()
+        try:
+            response = client.send_episode_update(payload)
+        except APIError as e:
+            error = str(e)
+        else:
+            if response.status == 429:
+                delay = retry_after(response, backoff * 2 ** attempt)
+                limiter.pause(delay)
+                get_metrics().increment('outbox_rate_limited_total')
+                error = f'rate limited, retry after {delay}s'
+                continue
+            elif response.status >= 500:
+                error = f'server error {response.status}'
+            elif response.status >= 400:
+                # Client errors will not succeed on retry.
+                return f'rejected with status {response.status}', True
+            else:
+                return None, False
+
+        if attempt < retries:
+            time.sleep(backoff * 2 ** attempt)
+
+    return error, False
+
+def flush_outbox(client, store, max_workers: int = DEFAULT_MAX_WORKERS, rate: float = DEFAULT_RATE,
+                 batch_size: int = DEFAULT_BATCH_SIZE, max_attempts: int = MAX_ATTEMPTS, backoff: float = 1.0) -> dict:
+    """Pushes queued episode updates with bounded concurrency and a shared
+    rate limit. Failed updates stay queued with exponential backoff until
+    max_attempts is reached; rejected ones are given up on straight away
+    and kept with their error. Database access stays on the calling thread."""
+    limiter = RateLimiter(rate, burst=max_workers)
+    summary = { 'sent': 0, 'failed': 0, 'rejected': 0 }
+    attempted = set()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            pending = [
+                (payload, attempts) for payload, attempts in store.get_pending_updates(batch_size, time.time(), max_attempts)
+                if payload['uuid'] not in attempted
+            ]
+            if not pending:
+                break
+
+            results = executor.map(lambda item: send_update(client, limiter, item[0], backoff=backoff), pending)
+            sent = []
+            failed = []
+            rejected = []
+            for (payload, attempts), (error, permanent) in zip(pending, results):
+                attempted.add(payload['uuid'])
+                if error is None:
+                    sent.append(payload)
+                elif permanent:
+                    logger.error(f"Giving up on episode update {payload['uuid']}: {error}")
+                    rejected.append((payload, error, max_attempts))
+                else:
+                    logger.error(f"Could not update episode {payload['uuid']}: {error}")
+                    next_attempt = time.time() + min(RETRY_BASE_SECONDS * 4 ** (attempts + 1), RETRY_MAX_SECONDS)
+                    failed.append((payload, error, next_attempt))
+
+            store.complete_updates(sent, failed, rejected)
+            summary['sent'] += len(sent)
+            summary['failed'] += len(failed)
+            summary['rejected'] += len(rejected)
+
+    for result in ('sent', 'failed', 'rejected'):
+        get_metrics().increment('outbox_updates_total', summary[result], result=result)
+    return summary
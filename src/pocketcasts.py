@@ -1,150 +1,305 @@
 import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import urllib3 # Added for exception handling
 from .auth import create_auth_headers
 from .logger import setup_logger
+from .metrics import get_metrics
+from .streaming import CHUNK_SIZE, iter_json_array
+from .transport import Transport, default_retries
 
 logger = setup_logger('pocketcasts_logger', 'pocketcasts_errors.log')
 
-def get_history(http, token):
-    header = create_auth_headers(token)
-    try:
-        response = http.request(
-            "POST",
-            "https://api.pocketcasts.com/user/history",
-            headers=header,
+class APIError(Exception):
+    """The API could not be reached or kept failing after retries. Raised
+    instead of returning empty data, so an outage is never mistaken for
+    "nothing new"."""
+
+API_URL = "https://api.pocketcasts.com"
+PODCAST_API_URL = "https://podcast-api.pocketcasts.com"
+# Episode updates only retry connection errors; see send_episode_update.
+UPDATE_RETRIES = default_retries(statuses=())
+
+def normalize(text):
+    return " ".join(re.sub(r"[^\w\s]", " ", (text or "").casefold()).split())
+
+def best_match(podcasts, title, author=None):
+    """Picks the search result that best matches title and author. Authors
+    are not always spelled the same across directories, so a matching
+    author only breaks ties between equally good titles; the API's own
+    ordering breaks any that remain. Returns None when no title matches,
+    rather than guessing at an unrelated podcast."""
+    title = normalize(title)
+    author = normalize(author)
+
+    def score(item):
+        index, podcast = item
+        candidate_title = normalize(podcast.get("title"))
+        candidate_author = normalize(podcast.get("author"))
+        title_score = 2 if candidate_title == title else 1 if title and title in candidate_title else 0
+        author_score = 0
+        if author and candidate_author:
+            author_score = 2 if candidate_author == author else 1 if author in candidate_author or candidate_author in author else 0
+        return (title_score, author_score, -index)
+
+    if not podcasts:
+        return None
+    best = max(enumerate(podcasts), key=score)
+    return best[1] if score(best)[0] else None
+
+def discard_response(response):
+    """Returns a response's connection to the pool without using its body.
+    A streamed body is read off first (or the connection closed), so the
+    next request never picks up a connection with data still on it."""
+    drain_conn = getattr(response, "drain_conn", None)
+    if drain_conn:
+        drain_conn()
+    else:
+        response.close()
+    response.release_conn()
+
+class PocketCastsClient():
+    def __init__(self, token, http=None, max_workers: int = 8, login=None,
+                 api_url=API_URL, podcast_api_url=PODCAST_API_URL):
+        self.max_workers = max_workers
+        # Overridable so the client can be pointed at a local stand-in API.
+        self.api_url = api_url
+        self.podcast_api_url = podcast_api_url
+        # block=True caps open connections per host at max_workers instead of
+        # opening (and discarding) extra ones under load.
+        self.http = http or Transport(maxsize=max_workers, block=True)
+        # Optional auth.CachedLogin used to fetch a token and replace it on 401.
+        self.login = login
+        self.token = token if token or not login else login.token()
+        self.token_lock = threading.Lock()
+
+    def refresh_token(self, stale_token):
+        with self.token_lock:
+            # Concurrent requests that all got a 401 only refresh once.
+            if self.token == stale_token:
+                self.token = self.login.refresh(stale_token)
+            return self.token
+
+    def request_raw(self, method, url, description, body=None, headers=None, preload_content=True, retries=None):
+        """retries overrides the transport's retry policy for this request."""
+        token = self.token
+        header = create_auth_headers(token)
+        if headers:
+            header.update(headers)
+
+        try:
+            response = self._timed_request(method, url, description, header, body, preload_content, retries)
+            if response.status == 401 and self.login:
+                logger.info(f"Token rejected {description}, logging in again.")
+                discard_response(response)
+                header.update(create_auth_headers(self.refresh_token(token)))
+                response = self._timed_request(method, url, description, header, body, preload_content, retries)
+            return response
+        except urllib3.exceptions.HTTPError as e:
+            logger.error(f"Network error {description}: {e}")
+            raise APIError(f"Network error {description}: {e}") from e
+
+    def _timed_request(self, method, url, description, header, body, preload_content, retries=None):
+        metrics = get_metrics()
+        kwargs = { "retries": retries } if retries is not None else {}
+        start = time.perf_counter()
+        response = self.http.request(method, url, headers=header, body=body, preload_content=preload_content, **kwargs)
+        metrics.observe('http_request_seconds', time.perf_counter() - start, endpoint=description)
+        metrics.increment('http_requests_total', endpoint=description, status=response.status)
+        if preload_content and response.data:
+            metrics.increment('bytes_received_total', len(response.data), endpoint=description)
+        return response
+
+    def request(self, method, url, description, default, body=None, headers=None):
+        """Decoded JSON body, or default when the request failed. Only for
+        calls where a missing answer is harmless; data that is synced uses
+        request_raw and lets APIError propagate."""
+        try:
+            response = self.request_raw(method, url, description, body=body, headers=headers)
+        except APIError:
+            return default
+        # A 4xx body decodes fine but is an error message, not the answer.
+        if not 200 <= response.status < 300:
+            logger.error(f"Unexpected status {response.status} {description}.")
+            return default
+
+        try:
+            return json.loads(response.data)
+        except json.JSONDecodeError:
+            logger.error(f"Failed to decode JSON response {description}: {response.data}")
+            return default
+
+    def get_history_response(self, etag=None, stream=False):
+        """Returns the undecoded history response. When etag is given the
+        request is conditional and an unchanged history comes back as a 304.
+        With stream=True the body is left unread for iter_response_items."""
+        headers = { "If-None-Match": etag } if etag else None
+        response = self.request_raw(
+            "POST", f"{self.api_url}/user/history", "fetching history",
+            headers=headers, preload_content=not stream
         )
-        data = json.loads(response.data)
-        return data
-    except (urllib3.exceptions.MaxRetryError, urllib3.exceptions.NewConnectionError) as e:
-        logger.error(f"Network error fetching history: {e}")
-        return {'episodes': []}  # Return default to prevent KeyError in main.py
-    except json.JSONDecodeError:
-        logger.error(f"Failed to decode JSON response from history API: {response.data}")
-        return {'episodes': []}
-    except Exception as e:
-        logger.error(f"An unexpected error occurred fetching history: {e}")
-        return {'episodes': []}
+        return self.raise_for_status(response, "fetching history")
 
-def search_podcasts(http, token, term):
-    header = create_auth_headers(token)
-    body = json.dumps({"term":term}, ensure_ascii=False).encode("ascii", errors="ignore")
-    header["content-length"] = len(body)
-    logger.debug(f"Search podcasts header: {header}") # Replaced print with logger
-    logger.debug(f"Search podcasts body: {body}") # Replaced print with logger
-    try:
-        response = http.request(
-            "POST",
-            "https://api.pocketcasts.com/discover/search",
-            headers=header,
-            body=body,
+    def raise_for_status(self, response, description):
+        """Anything but a success or a 304 means the data is unavailable, not
+        empty: a server error or 429 that outlasted the transport's retries,
+        or a 401/403 the login could not fix."""
+        if not (200 <= response.status < 300 or response.status == 304):
+            discard_response(response)
+            logger.error(f"Unexpected status {response.status} {description}.")
+            raise APIError(f"Unexpected status {response.status} {description}.")
+        return response
+
+    def iter_response_items(self, response, key, description, chunk_size=CHUNK_SIZE):
+        """Yields the items of the JSON array under key straight off the
+        socket. Decoding errors are logged and end the iteration."""
+        try:
+            yield from self.stream_response_items(response, key, chunk_size, description)
+        except (urllib3.exceptions.HTTPError, ValueError) as e:
+            logger.error(f"Failed to stream JSON response {description}: {e}")
+
+    def stream_response_items(self, response, key, chunk_size=CHUNK_SIZE, description="fetching history"):
+        """Like iter_response_items, but lets decoding errors propagate. A
+        connection abandoned part way through the body is closed rather than
+        returned to the pool with unread data on it."""
+        received = 0
+        def counted(chunks):
+            nonlocal received
+            for chunk in chunks:
+                received += len(chunk)
+                yield chunk
+
+        finished = False
+        try:
+            yield from iter_json_array(counted(response.stream(chunk_size)), key)
+            finished = True
+        finally:
+            if not finished:
+                response.close()
+            response.release_conn()
+            # Streamed bodies skip the count in _timed_request.
+            if received:
+                get_metrics().increment("bytes_received_total", received, endpoint=description)
+
+    def iter_history(self, chunk_size=CHUNK_SIZE):
+        response = self.get_history_response(stream=True)
+        return self.iter_response_items(response, "episodes", "fetching history", chunk_size)
+
+    def get_podcast_response(self, podcast_uuid, etag=None, last_modified=None):
+        """Fetches podcast/full/{uuid}, conditionally when validators from a
+        previous response are given; an unchanged podcast returns a 304."""
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        response = self.request_raw(
+            "GET", f"{self.podcast_api_url}/podcast/full/{podcast_uuid}", "fetching episodes", headers=headers
         )
-        return json.loads(response.data)
-    except (urllib3.exceptions.MaxRetryError, urllib3.exceptions.NewConnectionError) as e:
-        logger.error(f"Network error searching podcasts: {e}")
-        return {}
-    except json.JSONDecodeError:
-        logger.error(f"Failed to decode JSON response from podcast search API: {response.data}")
-        return {}
-    except Exception as e:
-        logger.error(f"An unexpected error occurred searching podcasts: {e}")
-        return {}
-
-
-def search_podcasts_and_get_first_uuid(http, token, term):
-    search_result = search_podcasts(http, token, term)
-    try:
-        search_result["podcasts"][0]
-    except(IndexError, KeyError):
-        return None
-    # Get the first result
-    # It would be very rare to have two podcasts with the same name
-    # FIXME: Also check author here. Not sure if authors are consistent
-    # across platforms.
-    return search_result["podcasts"][0]["uuid"]
+        return self.raise_for_status(response, "fetching episodes")
 
+    def iter_podcast_episodes(self, podcast_uuid, chunk_size=CHUNK_SIZE):
+        response = self.request_raw(
+            "GET", f"{self.podcast_api_url}/podcast/full/{podcast_uuid}", "fetching episodes",
+            preload_content=False
+        )
+        self.raise_for_status(response, "fetching episodes")
+        return self.iter_response_items(response, "episodes", "fetching episodes", chunk_size)
 
-def get_subscriptions(http, token):
-    header = create_auth_headers(token)
-    body = json.dumps({"v": 1}).encode("utf-8")
-    try:
-        response = http.request(
-            "POST",
-            "https://api.pocketcasts.com/user/podcast/list",
-            headers=header,
-            body=body,
+    def get_history(self):
+        response = self.get_history_response()
+        try:
+            return json.loads(response.data)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to decode JSON response fetching history: {response.data}")
+            raise APIError("Failed to decode JSON response fetching history.") from e
+
+    def search_podcasts(self, term):
+        body = json.dumps({"term":term}, ensure_ascii=False).encode("ascii", errors="ignore")
+        header = {"content-length": len(body)}
+        logger.debug(f"Search podcasts body: {body}")
+        return self.request("POST", f"{self.api_url}/discover/search", "searching podcasts", {}, body=body, headers=header)
+
+    def search_podcasts_and_get_first_uuid(self, term, author=None):
+        search_result = self.search_podcasts(term)
+        match = best_match(search_result.get("podcasts") or [], term, author)
+        return match["uuid"] if match else None
+
+    def get_subscriptions(self):
+        body = json.dumps({"v": 1}).encode("utf-8")
+        return self.request("POST", f"{self.api_url}/user/podcast/list", "fetching subscriptions", {}, body=body)
+
+    def add_subscription(self, uuid):
+        body = json.dumps({"uuid": uuid}).encode("utf-8")
+        return self.request("POST", f"{self.api_url}/user/podcast/subscribe", "adding subscription", {}, body=body)
+
+    def get_episodes(self, podcast_uuid):
+        episodes = {}
+        for episode in self.iter_podcast_episodes(podcast_uuid):
+            episodes[episode["title"]] = episode["uuid"]
+        return episodes
+
+    def iter_episodes(self, podcast_uuids):
+        """Fetches episodes for many podcasts at once, yielding
+        (podcast_uuid, episodes) pairs in the order they complete. A podcast
+        that fails is logged and left out; the rest are still yielded."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self.get_episodes, podcast_uuid): podcast_uuid
+                for podcast_uuid in podcast_uuids
+            }
+            for future in as_completed(futures):
+                try:
+                    episodes = future.result()
+                except APIError as e:
+                    logger.error(f"Skipping podcast {futures[future]}: {e}")
+                    continue
+                yield futures[future], episodes
+
+    def iter_subscribed_episodes(self):
+        subscriptions = self.get_subscriptions()
+        podcast_uuids = [ podcast["uuid"] for podcast in subscriptions.get("podcasts", []) ]
+        return self.iter_episodes(podcast_uuids)
+
+    def send_episode_update(self, payload: dict):
+        """Posts one episode update and returns the raw response so callers
+        can act on the status code. Raises APIError on a network error.
+        Statuses are not retried by the transport: the outbox handles 429s
+        through its shared rate limiter, and server errors itself."""
+        body = json.dumps(payload).encode("utf-8")
+        return self.request_raw(
+            "POST", f"{self.api_url}/sync/update_episode", "updating podcast episode",
+            body=body, headers={"Content-Type": "application/json"}, retries=UPDATE_RETRIES
         )
-        return json.loads(response.data)
-    except (urllib3.exceptions.MaxRetryError, urllib3.exceptions.NewConnectionError) as e:
-        logger.error(f"Network error fetching subscriptions: {e}")
-        return {}
-    except json.JSONDecodeError:
-        logger.error(f"Failed to decode JSON response from subscriptions API: {response.data}")
-        return {}
-    except Exception as e:
-        logger.error(f"An unexpected error occurred fetching subscriptions: {e}")
-        return {}
+
+    def update_podcast_episode(self, body):
+        logger.info(f"Updating episode: {body}")
+        return self.request("POST", f"{self.api_url}/sync/update_episode", "updating podcast episode", {}, body=body)
+
+
+def get_history(http, token):
+    return PocketCastsClient(token, http).get_history()
+
+def search_podcasts(http, token, term):
+    return PocketCastsClient(token, http).search_podcasts(term)
+
+
+def search_podcasts_and_get_first_uuid(http, token, term, author=None):
+    return PocketCastsClient(token, http).search_podcasts_and_get_first_uuid(term, author)
+
+
+def get_subscriptions(http, token):
+    return PocketCastsClient(token, http).get_subscriptions()
 
 
 def add_subscription(http, token, uuid):
-    header = create_auth_headers(token)
-    body = json.dumps({"uuid": uuid}).encode("utf-8")
-    try:
-        response = http.request(
-            "POST", "https://api.pocketcasts.com/user/podcast/subscribe", headers=header, body=body
-        )
-        return json.loads(response.data)
-    except (urllib3.exceptions.MaxRetryError, urllib3.exceptions.NewConnectionError) as e:
-        logger.error(f"Network error adding subscription: {e}")
-        return {}
-    except json.JSONDecodeError:
-        logger.error(f"Failed to decode JSON response from add subscription API: {response.data}")
-        return {}
-    except Exception as e:
-        logger.error(f"An unexpected error occurred adding subscription: {e}")
-        return {}
+    return PocketCastsClient(token, http).add_subscription(uuid)
 
 
 def get_episodes(http, token, podcast_uuid):
-    header = create_auth_headers(token)
-    try:
-        response = http.request(
-            "GET", f"https://podcast-api.pocketcasts.com/podcast/full/{podcast_uuid}",
-            headers=header
-        )
-        data = json.loads(response.data)
-        # Ensure "podcast" and "episodes" keys exist before accessing
-        if "podcast" in data and "episodes" in data["podcast"]:
-            episodes = {}
-            for episode in data["podcast"]["episodes"]:
-                episodes[episode["title"]] = episode["uuid"]
-            return episodes
-        else:
-            logger.error(f"Unexpected response structure from get_episodes API: {data}")
-            return {}
-    except (urllib3.exceptions.MaxRetryError, urllib3.exceptions.NewConnectionError) as e:
-        logger.error(f"Network error fetching episodes: {e}")
-        return {}
-    except json.JSONDecodeError:
-        logger.error(f"Failed to decode JSON response from get_episodes API: {response.data}")
-        return {}
-    except Exception as e:
-        logger.error(f"An unexpected error occurred fetching episodes: {e}")
-        return {}
+    return PocketCastsClient(token, http).get_episodes(podcast_uuid)
 
 def update_podcast_episode(http, token, body):
-    logger.info(f"Updating episode: {body}")
-    header = create_auth_headers(token)
-    try:
-        response = http.request(
-            "POST", "https://api.pocketcasts.com/sync/update_episode", headers=header, body=body
-        )
-        return json.loads(response.data)
-    except (urllib3.exceptions.MaxRetryError, urllib3.exceptions.NewConnectionError) as e:
-        logger.error(f"Network error updating podcast episode: {e}")
-        return {}
-    except json.JSONDecodeError:
-        logger.error(f"Failed to decode JSON response from update_episode API: {response.data}")
-        return {}
-    except Exception as e:
-        logger.error(f"An unexpected error occurred updating podcast episode: {e}")
-        return {}
\ No newline at end of file
+    return PocketCastsClient(token, http).update_podcast_episode(body)
@@ -0,0 +1,31 @@
+import math
+import sys
+
+from .sqlite_store import SQLiteStore
+
+DEFAULT_PAGE_SIZE = 20
+
+def search_history(store: SQLiteStore, text: str, page: int = 1, page_size: int = DEFAULT_PAGE_SIZE,
+                   prefix: bool = True) -> dict:
+    """One page of full-text search results over the listening history.
+    Pages start at 1; rows are full Listening_History rows, best match first."""
+    total = store.count_search_results(text, prefix)
+    rows = store.search_records(text, page_size, (page - 1) * page_size, prefix)
+    return {
+        'rows': rows,
+        'page': page,
+        'pages': math.ceil(total / page_size),
+        'total': total,
+    }
+
+def format_result(row) -> str:
+    # Full row: ID, Episode_UUID, ..., Title (5), ..., Podcast_Title (9), Author (10), Date_Saved (11)
+    return f'{row[11]}  {row[9]} - {row[5]}  [{row[1]}]'
+
+def main(argv=None) -> int:
+    # The arguments are defined once, in the cli module.
+    from .cli import main as cli_main
+    return cli_main(['search', *(sys.argv[1:] if argv is None else argv)])
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,16 +1,248 @@
+import json
+import re
 import sqlite3
 
+from .connection import DEFAULT_PROFILE, DEFAULT_READERS, ConnectionManager
+from .listen_record import ListenRecord
+from .streaming import chunked
+
+RECORD_COLUMNS = (
+    'Episode_UUID',
+    'URL',
+    'Published_Date',
+    'Duration',
+    'Title',
+    'Size',
+    'Is_Starred',
+    'Podcast_UUID',
+    'Podcast_Title',
+    'Author',
+)
+
+# Listening_Stats rollups: dimension -> (key, label) over a Listening_History
+# row. "month" is the month a record was saved.
+STATS_DIMENSIONS = {
+    'total': ("''", "''"),
+    'podcast': ('{row}.Podcast_UUID', '{row}.Podcast_Title'),
+    'author': ('{row}.Author', '{row}.Author'),
+    'month': ('substr({row}.Date_Saved, 1, 7)', 'substr({row}.Date_Saved, 1, 7)'),
+}
+
+def stats_trigger_sql(row: str, sign: int) -> str:
+    """Trigger statements adding (sign 1) or removing (sign -1) the `new` or
+    `old` row from every Listening_Stats rollup."""
+    return '\n'.join(f'''
+        INSERT INTO Listening_Stats (Dimension, Key, Label, Listens, Starred, Duration, Bytes)
+        VALUES ('{dimension}', {key.format(row=row)}, {label.format(row=row)}, {sign}, {sign} * {row}.Is_Starred,
+            {sign} * COALESCE({row}.Duration, 0), {sign} * COALESCE({row}.Size, 0))
+        ON CONFLICT (Dimension, Key) DO UPDATE SET
+            Label = excluded.Label,
+            Listens = Listens + excluded.Listens,
+            Starred = Starred + excluded.Starred,
+            Duration = Duration + excluded.Duration,
+            Bytes = Bytes + excluded.Bytes;
+    ''' for dimension, (key, label) in STATS_DIMENSIONS.items())
+
+# Schema upgrades applied in order, tracked through PRAGMA user_version.
+MIGRATIONS = (
+    # 1: drop duplicate episodes (keeping the first saved copy) so a UNIQUE
+    # index can be enforced on Episode_UUID.
+    '''
+        DELETE FROM Listening_History
+        WHERE ID NOT IN (
+            SELECT MIN(ID) FROM Listening_History GROUP BY Episode_UUID
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_listening_history_episode_uuid
+            ON Listening_History (Episode_UUID);
+    ''',
+    # 2: per-feed high-water mark and response fingerprint for incremental syncs.
+    '''
+        CREATE TABLE IF NOT EXISTS Sync_State (
+            Name TEXT PRIMARY KEY,
+            Last_Episode_UUID TEXT,
+            Fingerprint TEXT,
+            Date_Updated DATETIME DEFAULT CURRENT_TIMESTAMP);
+    ''',
+    # 3: keyset pagination index, newest first by (Date_Saved, ID).
+    '''
+        CREATE INDEX IF NOT EXISTS idx_listening_history_date_saved
+            ON Listening_History (Date_Saved, ID);
+    ''',
+    # 4: size backfill. The partial index only holds rows still missing a
+    # size, and hosts that keep failing are remembered between runs.
+    '''
+        CREATE INDEX IF NOT EXISTS idx_listening_history_zero_size
+            ON Listening_History (ID) WHERE Size = 0;
+        CREATE TABLE IF NOT EXISTS Backfill_Failures (
+            Host TEXT PRIMARY KEY,
+            Failures INTEGER NOT NULL DEFAULT 0,
+            Last_Error TEXT,
+            Date_Updated DATETIME DEFAULT CURRENT_TIMESTAMP);
+    ''',
+    # 5: outbox of episode updates waiting to be pushed to Pocket Casts. One
+    # row per episode; later updates are merged into the pending payload.
+    '''
+        CREATE TABLE IF NOT EXISTS Episode_Outbox (
+            Episode_UUID TEXT PRIMARY KEY,
+            Podcast_UUID TEXT NOT NULL,
+            Payload TEXT NOT NULL,
+            Attempts INTEGER NOT NULL DEFAULT 0,
+            Last_Error TEXT,
+            Next_Attempt REAL NOT NULL DEFAULT 0,
+            Date_Queued DATETIME DEFAULT CURRENT_TIMESTAMP);
+        CREATE INDEX IF NOT EXISTS idx_episode_outbox_next_attempt
+            ON Episode_Outbox (Next_Attempt);
+    ''',
+    # 6: cached podcast search results, keyed by normalized search term.
+    '''
+        CREATE TABLE IF NOT EXISTS Search_Cache (
+            Term TEXT PRIMARY KEY,
+            Results TEXT NOT NULL,
+            Date_Fetched REAL NOT NULL);
+    ''',
+    # 7: local podcast/episode catalog with HTTP validators for conditional
+    # refreshes.
+    '''
+        CREATE TABLE IF NOT EXISTS Podcasts (
+            UUID TEXT PRIMARY KEY,
+            Title TEXT,
+            Author TEXT,
+            ETag TEXT,
+            Last_Modified TEXT,
+            Date_Fetched REAL NOT NULL);
+        CREATE TABLE IF NOT EXISTS Episodes (
+            UUID TEXT PRIMARY KEY,
+            Podcast_UUID TEXT NOT NULL REFERENCES Podcasts (UUID),
+            Title TEXT NOT NULL,
+            URL TEXT,
+            Published_Date TEXT,
+            Duration INTEGER,
+            Size INTEGER);
+        CREATE INDEX IF NOT EXISTS idx_episodes_podcast_title
+            ON Episodes (Podcast_UUID, Title);
+    ''',
+    # 8: full-text index over episode title, podcast title and author. The
+    # index stores no copy of the text (content= points back at
+    # Listening_History) and triggers keep it in step with the table. Size
+    # backfills and starring do not touch the indexed columns, so they skip
+    # the update trigger.
+    '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS History_Search USING fts5 (
+            Title, Podcast_Title, Author,
+            content = 'Listening_History', content_rowid = 'ID',
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3');
+        CREATE TRIGGER IF NOT EXISTS history_search_insert AFTER INSERT ON Listening_History BEGIN
+            INSERT INTO History_Search (rowid, Title, Podcast_Title, Author)
+            VALUES (new.ID, new.Title, new.Podcast_Title, new.Author);
+        END;
+        CREATE TRIGGER IF NOT EXISTS history_search_update
+        AFTER UPDATE OF Title, Podcast_Title, Author ON Listening_History BEGIN
+            INSERT INTO History_Search (History_Search, rowid, Title, Podcast_Title, Author)
+            VALUES ('delete', old.ID, old.Title, old.Podcast_Title, old.Author);
+            INSERT INTO History_Search (rowid, Title, Podcast_Title, Author)
+            VALUES (new.ID, new.Title, new.Podcast_Title, new.Author);
+        END;
+        CREATE TRIGGER IF NOT EXISTS history_search_delete AFTER DELETE ON Listening_History BEGIN
+            INSERT INTO History_Search (History_Search, rowid, Title, Podcast_Title, Author)
+            VALUES ('delete', old.ID, old.Title, old.Podcast_Title, old.Author);
+        END;
+        INSERT INTO History_Search (History_Search) VALUES ('rebuild');
+    ''',
+    # 9: listening statistics rolled up per podcast, author and month plus a
+    # grand total. Triggers keep them current on every insert, update and
+    # delete, so reports never scan the history; existing rows are rolled
+    # up here.
+    f'''
+        CREATE TABLE IF NOT EXISTS Listening_Stats (
+            Dimension TEXT NOT NULL,
+            Key TEXT NOT NULL,
+            Label TEXT,
+            Listens INTEGER NOT NULL DEFAULT 0,
+            Starred INTEGER NOT NULL DEFAULT 0,
+            Duration INTEGER NOT NULL DEFAULT 0,
+            Bytes INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (Dimension, Key)) WITHOUT ROWID;
+        CREATE TRIGGER IF NOT EXISTS listening_stats_insert AFTER INSERT ON Listening_History BEGIN
+            { stats_trigger_sql('new', 1) }
+        END;
+        CREATE TRIGGER IF NOT EXISTS listening_stats_update
+        AFTER UPDATE OF Is_Starred, Duration, Size, Podcast_UUID, Podcast_Title, Author, Date_Saved
+        ON Listening_History BEGIN
+            { stats_trigger_sql('old', -1) }
+            { stats_trigger_sql('new', 1) }
+        END;
+        CREATE TRIGGER IF NOT EXISTS listening_stats_delete AFTER DELETE ON Listening_History BEGIN
+            { stats_trigger_sql('old', -1) }
+        END;
+        DELETE FROM Listening_Stats;
+        INSERT INTO Listening_Stats (Dimension, Key, Label, Listens, Starred, Duration, Bytes)
+        { ' UNION ALL '.join(f"""
+            SELECT '{dimension}', {key.format(row='Listening_History')}, MAX({label.format(row='Listening_History')}),
+                COUNT(*), TOTAL(Is_Starred), TOTAL(Duration), TOTAL(Size)
+            FROM Listening_History GROUP BY {key.format(row='Listening_History')}
+        """ for dimension, (key, label) in STATS_DIMENSIONS.items()) };
+    ''',
+    # 10: export watermarks, the last (Date_Saved, ID) key written by each
+    # named export, so incremental exports only read newer rows.
+    '''
+        CREATE TABLE IF NOT EXISTS Export_State (
+            Name TEXT PRIMARY KEY,
+            Last_Date_Saved TEXT NOT NULL,
+            Last_ID INTEGER NOT NULL,
+            Rows INTEGER NOT NULL DEFAULT 0,
+            Date_Exported DATETIME DEFAULT CURRENT_TIMESTAMP);
+    ''',
+    # 11: backfill failures expire. Host bans get a retry time (the table is
+    # recreated, lifting bans made without one), and URLs that answer
+    # without a size are tracked on their own so one dead file does not
+    # count against its host.
+    '''
+        DROP TABLE IF EXISTS Backfill_Failures;
+        CREATE TABLE Backfill_Failures (
+            Host TEXT PRIMARY KEY,
+            Failures INTEGER NOT NULL DEFAULT 0,
+            Last_Error TEXT,
+            Retry_After REAL NOT NULL DEFAULT 0,
+            Date_Updated DATETIME DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE IF NOT EXISTS Backfill_URL_Failures (
+            URL TEXT PRIMARY KEY,
+            Failures INTEGER NOT NULL DEFAULT 0,
+            Last_Error TEXT,
+            Retry_After REAL NOT NULL DEFAULT 0);
+    ''',
+)
+
+# Measured fastest for 100k-UUID batches; far below SQLite's parameter limit.
+UUID_CHUNK_SIZE = 500
+
+# Full Listening_History row, ID first, as used by ListenRecord.Row_Factory.
+FULL_COLUMNS = ('ID',) + RECORD_COLUMNS + ('Date_Saved',)
+
+# bm25 weights for Title, Podcast_Title and Author: a match in the episode
+# title says more about an episode than one in the podcast's name.
+SEARCH_WEIGHTS = (10.0, 4.0, 2.0)
+
+def search_query(text: str, prefix: bool = True) -> str:
+    """Turns free text into an FTS5 query that matches every word. Words are
+    quoted, so punctuation in titles can never be read as query syntax, and
+    with prefix each one also matches longer words ("churc" -> "Churchill")."""
+    terms = re.findall(r'\w+', text)
+    return ' '.join(f'"{term}"' + ('*' if prefix else '') for term in terms)
+
 class SQLiteStore():
-    def __init__(self, db_name: str):
+    def __init__(self, db_name: str, profile: str = DEFAULT_PROFILE, readers: int = DEFAULT_READERS):
         self.db_name = db_name
+        # db_connection is the single writer; queries borrow read-only
+        # connections from the manager.
+        self.connections = ConnectionManager(db_name, profile, readers)
         self.db_connection = self.create_database()
 
     def close(self):
         if self.db_connection:
-            self.db_connection.close()
+            self.connections.close()
 
     def create_database(self) -> sqlite3.Connection:
-        with sqlite3.connect(self.db_name) as connection:
+        with self.connections.writer as connection:
             cursor = connection.cursor()
             cursor.execute(f'''
                 CREATE TABLE IF NOT EXISTS Listening_History (
@@ -27,36 +259,210 @@ class SQLiteStore():
                     Author TEXT NOT NULL,
                     Date_Saved DATETIME DEFAULT CURRENT_TIMESTAMP)
             ''')
+        self.migrate_database(connection)
         return connection
 
+    def migrate_database(self, connection: sqlite3.Connection) -> int:
+        version = connection.execute('PRAGMA user_version').fetchone()[0]
+
+        for target, script in enumerate(MIGRATIONS[version:], start=version + 1):
+            # executescript() commits any pending transaction first, so the
+            # migration and its version bump are wrapped explicitly.
+            connection.executescript(f'''
+                BEGIN;
+                {script}
+                PRAGMA user_version = {target};
+                COMMIT;
+            ''')
+
+        return len(MIGRATIONS)
+
     def get_records(self, count=100) -> list:
         if not self.db_connection:
             print("Error: No Database connection.")
             return
 
-        with self.db_connection:
-            cursor = self.db_connection.cursor()
-            cursor.execute(f'''
+        with self.connections.reader() as connection:
+            cursor = connection.cursor()
+            cursor.execute('''
                 SELECT Episode_UUID, URL, Published_Date, Duration, Title, Size, Is_Starred, Podcast_UUID, Podcast_Title, Author, Date_Saved
                 FROM Listening_History
-                ORDER BY Date_Saved DESC
-                LIMIT {count}
-            ''')
+                ORDER BY Date_Saved DESC, ID DESC
+                LIMIT ?
+            ''', (count,))
+            return cursor.fetchall()
+
+    def get_listen_records(self, count=100) -> list[ListenRecord]:
+        rows, _ = self.get_records_page(count, row_factory=ListenRecord.Row_Factory)
+        return rows
+
+    def _keyset_cursor(self, connection, after, descending, row_factory):
+        """Executes a full-row query ordered by (Date_Saved, ID), starting
+        just past the `after` key. The index on those columns serves both
+        the filter and the ordering, so every page costs the same."""
+        direction = 'DESC' if descending else 'ASC'
+        where = ''
+        parameters = ()
+        if after:
+            where = f"WHERE (Date_Saved, ID) {'<' if descending else '>'} (?, ?)"
+            parameters = tuple(after)
+
+        cursor = connection.cursor()
+        if row_factory:
+            cursor.row_factory = row_factory
+        cursor.execute(f'''
+            SELECT { ', '.join(FULL_COLUMNS) }
+            FROM Listening_History
+            {where}
+            ORDER BY Date_Saved {direction}, ID {direction}
+        ''', parameters)
+        return cursor
+
+    def get_records_page(self, limit=100, after=None, descending=True, row_factory=None) -> tuple:
+        """Returns (rows, next_key). Pass next_key back as `after` to fetch
+        the following page; it is None once the table is exhausted."""
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        with self.connections.reader() as connection:
+            cursor = self._keyset_cursor(connection, after, descending, row_factory)
+            rows = cursor.fetchmany(limit)
+            cursor.close()
+
+        if len(rows) < limit:
+            return rows, None
+
+        last = rows[-1]
+        if isinstance(last, ListenRecord):
+            return rows, (last.date_added, last.id)
+        return rows, (last[-1], last[0])
+
+    def iter_records(self, batch_size=1000, after=None, descending=True, row_factory=None):
+        """Yields lists of at most batch_size full rows, reading the archive
+        through one cursor with fetchmany so memory use stays constant."""
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        with self.connections.reader() as connection:
+            cursor = self._keyset_cursor(connection, after, descending, row_factory)
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                cursor.close()
+
+    def get_stats(self, dimension: str, limit: int = None, order_by: str = 'listens') -> list[dict]:
+        """Precomputed rollups for one of STATS_DIMENSIONS, largest first by
+        listens, duration or bytes (months are returned newest first)."""
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        if dimension not in STATS_DIMENSIONS:
+            raise ValueError(f"Unknown statistics dimension '{dimension}'. Choose one of: {', '.join(STATS_DIMENSIONS)}")
+        columns = { 'listens': 'Listens', 'starred': 'Starred', 'duration': 'Duration', 'bytes': 'Bytes' }
+        if order_by not in columns:
+            raise ValueError(f"Unknown statistics order '{order_by}'. Choose one of: {', '.join(columns)}")
+        order = 'Key DESC' if dimension == 'month' else f'{columns[order_by]} DESC, Key'
+
+        with self.connections.reader() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f'''
+                SELECT Key, Label, Listens, Starred, Duration, Bytes
+                FROM Listening_Stats
+                WHERE Dimension = ? AND Listens > 0
+                ORDER BY {order}
+                LIMIT ?
+            ''', (dimension, -1 if limit is None else limit))
+            return [
+                dict(zip(('key', 'label', 'listens', 'starred', 'duration', 'bytes'), row))
+                for row in cursor.fetchall()
+            ]
+
+    def get_stats_summary(self) -> dict:
+        """Totals over the whole history, read from a single rollup row."""
+        totals = self.get_stats('total')
+        summary = totals[0] if totals else { 'listens': 0, 'starred': 0, 'duration': 0, 'bytes': 0 }
+        return {
+            'listens': summary['listens'],
+            'starred': summary['starred'],
+            'starred_ratio': summary['starred'] / summary['listens'] if summary['listens'] else 0.0,
+            'duration': summary['duration'],
+            'bytes': summary['bytes'],
+        }
+
+    def search_records(self, text: str, limit: int = 20, offset: int = 0, prefix: bool = True,
+                       row_factory=None) -> list:
+        """Full-text search over episode title, podcast title and author.
+        Returns full rows, best match first (newest first on ties); page
+        through results with offset."""
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        query = search_query(text, prefix)
+        if not query:
+            return []
+
+        with self.connections.reader() as connection:
+            cursor = connection.cursor()
+            if row_factory:
+                cursor.row_factory = row_factory
+            cursor.execute(f'''
+                SELECT { ', '.join(f'Listening_History.{column}' for column in FULL_COLUMNS) }
+                FROM History_Search
+                JOIN Listening_History ON Listening_History.ID = History_Search.rowid
+                WHERE History_Search MATCH ?
+                ORDER BY bm25(History_Search, { ', '.join(map(str, SEARCH_WEIGHTS)) }), Listening_History.ID DESC
+                LIMIT ? OFFSET ?
+            ''', (query, limit, offset))
             return cursor.fetchall()
 
+    def count_search_results(self, text: str, prefix: bool = True) -> int:
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        query = search_query(text, prefix)
+        if not query:
+            return 0
+
+        with self.connections.reader() as connection:
+            cursor = connection.cursor()
+            cursor.execute('SELECT COUNT(*) FROM History_Search WHERE History_Search MATCH ?', (query,))
+            return cursor.fetchone()[0]
+
     def get_records_by_uuid(self, records: list) -> list:
         if not self.db_connection:
             print("Error: No Database connection.")
             return
-        
+
+        return [ (uuid,) for uuid in self.get_existing_uuids(record['uuid'] for record in records) ]
+
+    def get_existing_uuids(self, uuids) -> set:
+        """Returns the subset of uuids already stored. Lookups run in
+        IN (...) chunks that stay under SQLite's host parameter limit, each
+        one served by the Episode_UUID index."""
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
         cursor = self.db_connection.cursor()
-        cursor.execute(f'''
-            SELECT Episode_UUID
-            FROM Listening_History
-            WHERE episode_uuid IN ({ ','.join(['?'] * len(records)) })
-        ''', [ record['uuid'] for record in records ])
-        
-        return cursor.fetchall()
+        existing = set()
+        for chunk in chunked(uuids, UUID_CHUNK_SIZE):
+            cursor.execute(f'''
+                SELECT Episode_UUID
+                FROM Listening_History
+                WHERE Episode_UUID IN ({ ','.join(['?'] * len(chunk)) })
+            ''', chunk)
+            existing.update(row[0] for row in cursor.fetchall())
+
+        return existing
 
     def save_records(self, records: list[dict]) -> int:
         if not records:
@@ -65,35 +471,415 @@ class SQLiteStore():
         if not self.db_connection:
             print("Error: No Database connection.")
             return
-        
+
+        counts = self.upsert_records(records)
+
+        return counts['inserted'] + counts['updated']
+
+    def upsert_records(self, records: list[dict]) -> dict:
+        if not records:
+            return { 'inserted': 0, 'updated': 0, 'unchanged': 0 }
+
+        return self.save_record_stream(records, chunk_size=len(records))
+
+    def save_record_stream(self, records, chunk_size: int = 500) -> dict:
+        """Upserts records, newest first as the history returns them, from
+        any iterable. Records are decoded chunk_size at a time into a temp
+        table and inserted in one ordered statement, so a streamed sync
+        assigns IDs exactly as a buffered one does."""
+        counts = { 'inserted': 0, 'updated': 0, 'unchanged': 0 }
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        with self.db_connection:
+            cursor = self.db_connection.cursor()
+            # FTS5 flushes its pending index data at the end of every
+            # statement, so running the search triggers once per row through
+            # executemany would write a new index segment per record.
+            cursor.execute(f'''
+                CREATE TEMP TABLE IF NOT EXISTS Incoming_Records ({ ', '.join(RECORD_COLUMNS) })
+            ''')
+            try:
+                for chunk in chunked(records, chunk_size):
+                    cursor.executemany(f'''
+                        INSERT INTO temp.Incoming_Records VALUES ({ ', '.join(['?'] * len(RECORD_COLUMNS)) })
+                    ''', [(
+                            record['uuid'],
+                            record['url'],
+                            record['published'],
+                            record['duration'],
+                            record['title'],
+                            record['size'],
+                            record['starred'],
+                            record['podcastUuid'],
+                            record['podcastTitle'],
+                            record['author']
+                        ) for record in chunk
+                    ])
+
+                cursor.execute('''
+                    SELECT COUNT(DISTINCT Episode_UUID),
+                        COUNT(DISTINCT CASE WHEN Episode_UUID IN (SELECT Episode_UUID FROM Listening_History)
+                            THEN Episode_UUID END)
+                    FROM temp.Incoming_Records
+                ''')
+                total, existing = cursor.fetchone()
+
+                # Keep the newest copy of any episode repeated in the history,
+                # then insert oldest first so IDs follow listening order. The
+                # WHERE clause skips rows whose values are identical, so
+                # rowcount only reflects inserts and real updates.
+                cursor.execute(f'''
+                    INSERT INTO Listening_History ({ ', '.join(RECORD_COLUMNS) })
+                    SELECT { ', '.join(RECORD_COLUMNS) } FROM temp.Incoming_Records
+                    WHERE rowid IN (SELECT MIN(rowid) FROM temp.Incoming_Records GROUP BY Episode_UUID)
+                    ORDER BY rowid DESC
+                    ON CONFLICT (Episode_UUID) DO UPDATE SET
+                        { ', '.join(f'{column} = excluded.{column}' for column in RECORD_COLUMNS[1:]) }
+                    WHERE { ' OR '.join(f'{column} IS NOT excluded.{column}' for column in RECORD_COLUMNS[1:]) }
+                ''')
+                changed = cursor.rowcount
+            finally:
+                cursor.execute('DELETE FROM temp.Incoming_Records')
+
+        counts['inserted'] = total - existing
+        counts['updated'] = changed - counts['inserted']
+        counts['unchanged'] = total - counts['inserted'] - counts['updated']
+        return counts
+
+    def get_sync_state(self, name: str) -> dict:
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        cursor = self.db_connection.cursor()
+        cursor.execute('''
+            SELECT Last_Episode_UUID, Fingerprint, Date_Updated
+            FROM Sync_State
+            WHERE Name = ?
+        ''', (name,))
+        row = cursor.fetchone()
+        if not row:
+            return {}
+
+        return { 'last_episode_uuid': row[0], 'fingerprint': row[1], 'date_updated': row[2] }
+
+    def set_sync_state(self, name: str, last_episode_uuid: str, fingerprint: str):
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        with self.db_connection:
+            self.db_connection.execute('''
+                INSERT INTO Sync_State (Name, Last_Episode_UUID, Fingerprint)
+                VALUES (?, ?, ?)
+                ON CONFLICT (Name) DO UPDATE SET
+                    Last_Episode_UUID = excluded.Last_Episode_UUID,
+                    Fingerprint = excluded.Fingerprint,
+                    Date_Updated = CURRENT_TIMESTAMP
+            ''', (name, last_episode_uuid, fingerprint))
+
+    def get_export_watermark(self, name: str):
+        """Returns the (Date_Saved, ID) key of the last row exported under
+        name, usable as `after` for iter_records, or None."""
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
         cursor = self.db_connection.cursor()
-        cursor.executemany('''
-            INSERT INTO Listening_History (
-                Episode_UUID,
-                URL,
-                Published_Date,
-                Duration,
-                Title,
-                Size,
-                Is_Starred,
-                Podcast_UUID,
-                Podcast_Title,
-                Author
+        cursor.execute('SELECT Last_Date_Saved, Last_ID FROM Export_State WHERE Name = ?', (name,))
+        row = cursor.fetchone()
+        return tuple(row) if row else None
+
+    def set_export_watermark(self, name: str, key: tuple, rows: int):
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        with self.db_connection:
+            self.db_connection.execute('''
+                INSERT INTO Export_State (Name, Last_Date_Saved, Last_ID, Rows)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (Name) DO UPDATE SET
+                    Last_Date_Saved = excluded.Last_Date_Saved,
+                    Last_ID = excluded.Last_ID,
+                    Rows = excluded.Rows,
+                    Date_Exported = CURRENT_TIMESTAMP
+            ''', (name, key[0], key[1], rows))
+
+    def get_zero_size_records(self, limit: int = 200, after_id: int = 0) -> list:
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        cursor = self.db_connection.cursor()
+        cursor.execute('''
+            SELECT ID, URL
+            FROM Listening_History
+            WHERE Size = 0 AND ID > ?
+            ORDER BY ID
+            LIMIT ?
+        ''', (after_id, limit))
+        return cursor.fetchall()
+
+    def update_sizes(self, sizes: list[tuple]) -> int:
+        """Takes (ID, Size) pairs and writes them in one transaction."""
+        if not sizes:
+            return 0
+
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        with self.db_connection:
+            cursor = self.db_connection.cursor()
+            cursor.executemany('''
+                UPDATE Listening_History SET Size = ? WHERE ID = ? AND Size = 0
+            ''', [ (size, id) for id, size in sizes ])
+
+        return cursor.rowcount
+
+    def get_failed_hosts(self, max_failures: int, now: float) -> set:
+        """Hosts that failed max_failures batches in a row and are still
+        within their cooldown."""
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        cursor = self.db_connection.cursor()
+        cursor.execute('''
+            SELECT Host FROM Backfill_Failures WHERE Failures >= ? AND Retry_After > ?
+        ''', (max_failures, now))
+        return { row[0] for row in cursor.fetchall() }
+
+    def get_failed_urls(self, now: float) -> set:
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        cursor = self.db_connection.cursor()
+        cursor.execute('SELECT URL FROM Backfill_URL_Failures WHERE Retry_After > ?', (now,))
+        return { row[0] for row in cursor.fetchall() }
+
+    def record_host_results(self, failures: dict, successes: set, now: float, cooldown: float):
+        """failures maps host to its latest error. A host that also had a
+        success is not counted as failing, and its count is reset; one that
+        keeps failing is retried again cooldown seconds after its last
+        failure."""
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        with self.db_connection:
+            self.db_connection.executemany('''
+                INSERT INTO Backfill_Failures (Host, Failures, Last_Error, Retry_After)
+                VALUES (?, 1, ?, ?)
+                ON CONFLICT (Host) DO UPDATE SET
+                    Failures = Failures + 1,
+                    Last_Error = excluded.Last_Error,
+                    Retry_After = excluded.Retry_After,
+                    Date_Updated = CURRENT_TIMESTAMP
+            ''', [ (host, error, now + cooldown) for host, error in failures.items() if host not in successes ])
+            self.db_connection.executemany(
+                'DELETE FROM Backfill_Failures WHERE Host = ?', [ (host,) for host in successes ]
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', [(
-                record['uuid'],
-                record['url'],
-                record['published'],
-                record['duration'],
-                record['title'],
-                record['size'],
-                record['starred'],
-                record['podcastUuid'],
-                record['podcastTitle'],
-                record['author']
-            ) for record in reversed(records)
-        ])
-        self.db_connection.commit()
-        
-        return len(records)
\ No newline at end of file
+
+    def record_url_failures(self, failures: dict, now: float, cooldown: float, max_cooldown: float):
+        """failures maps URL to its latest error. Each further failure
+        doubles the wait before the URL is tried again, up to max_cooldown."""
+        if not failures:
+            return
+
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        with self.db_connection:
+            self.db_connection.executemany('''
+                INSERT INTO Backfill_URL_Failures (URL, Failures, Last_Error, Retry_After)
+                VALUES (?1, 1, ?2, ?3 + ?4)
+                ON CONFLICT (URL) DO UPDATE SET
+                    Failures = Failures + 1,
+                    Last_Error = excluded.Last_Error,
+                    Retry_After = ?3 + MIN(?4 * (1 << MIN(Failures, 30)), ?5)
+            ''', [ (url, error, now, cooldown, max_cooldown) for url, error in failures.items() ])
+
+    def enqueue_episode_updates(self, updates: list[dict]) -> int:
+        """Queues updates shaped like {"uuid": ..., "podcast": ..., <fields>}.
+        A pending update for the same episode is merged rather than
+        duplicated, with newer field values winning."""
+        if not updates:
+            return 0
+
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        with self.db_connection:
+            self.db_connection.executemany('''
+                INSERT INTO Episode_Outbox (Episode_UUID, Podcast_UUID, Payload)
+                VALUES (?, ?, ?)
+                ON CONFLICT (Episode_UUID) DO UPDATE SET
+                    Podcast_UUID = excluded.Podcast_UUID,
+                    Payload = json_patch(Payload, excluded.Payload),
+                    Attempts = 0,
+                    Last_Error = NULL,
+                    Next_Attempt = 0
+            ''', [
+                (update['uuid'], update['podcast'], json.dumps(update)) for update in updates
+            ])
+
+        return len(updates)
+
+    def get_pending_updates(self, limit: int, now: float, max_attempts: int) -> list[dict]:
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        cursor = self.db_connection.cursor()
+        cursor.execute('''
+            SELECT Payload, Attempts
+            FROM Episode_Outbox
+            WHERE Next_Attempt <= ? AND Attempts < ?
+            ORDER BY Next_Attempt
+            LIMIT ?
+        ''', (now, max_attempts, limit))
+        return [ (json.loads(payload), attempts) for payload, attempts in cursor.fetchall() ]
+
+    def complete_updates(self, sent: list[dict], failed: list[tuple], rejected: list[tuple] = ()):
+        """Removes sent payloads from the outbox and schedules failed ones,
+        given as (payload, error, next_attempt), for a retry. Rejected ones,
+        given as (payload, error, attempts), are kept with attempts set so
+        they are no longer pending. A payload that was merged with a newer
+        update while in flight is left queued."""
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        with self.db_connection:
+            self.db_connection.executemany('''
+                DELETE FROM Episode_Outbox WHERE Episode_UUID = ? AND json(Payload) = json(?)
+            ''', [ (payload['uuid'], json.dumps(payload)) for payload in sent ])
+            self.db_connection.executemany('''
+                UPDATE Episode_Outbox
+                SET Attempts = Attempts + 1, Last_Error = ?, Next_Attempt = ?
+                WHERE Episode_UUID = ?
+            ''', [ (error, next_attempt, payload['uuid']) for payload, error, next_attempt in failed ])
+            self.db_connection.executemany('''
+                UPDATE Episode_Outbox
+                SET Attempts = MAX(Attempts + 1, ?), Last_Error = ?
+                WHERE Episode_UUID = ? AND json(Payload) = json(?)
+            ''', [ (attempts, error, payload['uuid'], json.dumps(payload)) for payload, error, attempts in rejected ])
+
+    def get_cached_searches(self, terms: list[str], max_age: float, now: float) -> dict:
+        """Returns {term: results} for terms searched within max_age seconds."""
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        cached = {}
+        cursor = self.db_connection.cursor()
+        for chunk in chunked(terms, UUID_CHUNK_SIZE):
+            cursor.execute(f'''
+                SELECT Term, Results
+                FROM Search_Cache
+                WHERE Term IN ({ ','.join(['?'] * len(chunk)) }) AND Date_Fetched >= ?
+            ''', chunk + [now - max_age])
+            cached.update((term, json.loads(results)) for term, results in cursor.fetchall())
+
+        return cached
+
+    def cache_searches(self, results: dict, now: float):
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        with self.db_connection:
+            self.db_connection.executemany('''
+                INSERT INTO Search_Cache (Term, Results, Date_Fetched)
+                VALUES (?, ?, ?)
+                ON CONFLICT (Term) DO UPDATE SET
+                    Results = excluded.Results,
+                    Date_Fetched = excluded.Date_Fetched
+            ''', [ (term, json.dumps(podcasts), now) for term, podcasts in results.items() ])
+
+    def get_podcast(self, podcast_uuid: str) -> dict:
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        cursor = self.db_connection.cursor()
+        cursor.execute('''
+            SELECT UUID, Title, Author, ETag, Last_Modified, Date_Fetched FROM Podcasts WHERE UUID = ?
+        ''', (podcast_uuid,))
+        row = cursor.fetchone()
+        if not row:
+            return {}
+
+        return dict(zip(('uuid', 'title', 'author', 'etag', 'last_modified', 'date_fetched'), row))
+
+    def save_podcast(self, podcast: dict, episodes: list[dict], etag: str, last_modified: str, now: float):
+        """Replaces the stored episode list of a podcast in one transaction."""
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        with self.db_connection:
+            self.db_connection.execute('''
+                INSERT INTO Podcasts (UUID, Title, Author, ETag, Last_Modified, Date_Fetched)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (UUID) DO UPDATE SET
+                    Title = excluded.Title,
+                    Author = excluded.Author,
+                    ETag = excluded.ETag,
+                    Last_Modified = excluded.Last_Modified,
+                    Date_Fetched = excluded.Date_Fetched
+            ''', (podcast['uuid'], podcast.get('title'), podcast.get('author'), etag, last_modified, now))
+            self.db_connection.execute('DELETE FROM Episodes WHERE Podcast_UUID = ?', (podcast['uuid'],))
+            self.db_connection.executemany('''
+                INSERT OR REPLACE INTO Episodes (UUID, Podcast_UUID, Title, URL, Published_Date, Duration, Size)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(
+                    episode['uuid'],
+                    podcast['uuid'],
+                    episode.get('title', ''),
+                    episode.get('url'),
+                    episode.get('published'),
+                    episode.get('duration'),
+                    episode.get('file_size') or episode.get('size'),
+                ) for episode in episodes
+            ])
+
+    def touch_podcast(self, podcast_uuid: str, now: float):
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        with self.db_connection:
+            self.db_connection.execute('UPDATE Podcasts SET Date_Fetched = ? WHERE UUID = ?', (now, podcast_uuid))
+
+    def get_podcast_episodes(self, podcast_uuid: str) -> dict:
+        """Returns the stored title -> episode UUID map of a podcast."""
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        cursor = self.db_connection.cursor()
+        cursor.execute('SELECT Title, UUID FROM Episodes WHERE Podcast_UUID = ?', (podcast_uuid,))
+        return dict(cursor.fetchall())
+
+    def get_episode(self, episode_uuid: str) -> dict:
+        if not self.db_connection:
+            print("Error: No Database connection.")
+            return
+
+        cursor = self.db_connection.cursor()
+        cursor.execute('''
+            SELECT UUID, Podcast_UUID, Title, URL, Published_Date, Duration, Size FROM Episodes WHERE UUID = ?
+        ''', (episode_uuid,))
+        row = cursor.fetchone()
+        if not row:
+            return {}
+
+        return dict(zip(('uuid', 'podcast_uuid', 'title', 'url', 'published_date', 'duration', 'size'), row))
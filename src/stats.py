@@ -0,0 +1,53 @@
+import sys
+
+from .sqlite_store import SQLiteStore
+
+DEFAULT_LIMIT = 10
+
+def format_duration(seconds: int) -> str:
+    hours, remainder = divmod(int(seconds), 3600)
+    return f'{hours}h {remainder // 60:02d}m'
+
+def format_bytes(size: int) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} TB'
+
+def build_report(store: SQLiteStore, dimensions=('podcast', 'author', 'month'), limit: int = DEFAULT_LIMIT,
+                 order_by: str = 'listens') -> dict:
+    """Summary plus the top rows of each requested rollup. Everything is
+    read from Listening_Stats, so the cost does not grow with the history."""
+    return {
+        'summary': store.get_stats_summary(),
+        **{ dimension: store.get_stats(dimension, limit, order_by) for dimension in dimensions },
+    }
+
+def format_report(report: dict) -> str:
+    summary = report['summary']
+    lines = [
+        f"Listens:  {summary['listens']}",
+        f"Starred:  {summary['starred']} ({summary['starred_ratio']:.1%})",
+        f"Duration: {format_duration(summary['duration'])}",
+        f"Size:     {format_bytes(summary['bytes'])}",
+    ]
+    for dimension, rows in report.items():
+        if dimension == 'summary':
+            continue
+        lines.append('')
+        lines.append(f'By {dimension}:')
+        for row in rows:
+            lines.append(
+                f"  {row['label'][:40]:<40} {row['listens']:>6} listens  {row['starred']:>4} starred  "
+                f"{format_duration(row['duration']):>10}  {format_bytes(row['bytes']):>10}"
+            )
+    return '\n'.join(lines)
+
+def main(argv=None) -> int:
+    # The arguments are defined once, in the cli module.
+    from .cli import main as cli_main
+    return cli_main(['stats', *(sys.argv[1:] if argv is None else argv)])
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import codecs
+import json
+
+CHUNK_SIZE = 64 * 1024
+
+def iter_json_array(chunks, key: str):
+    """Incrementally decodes the array stored under key from an iterable of
+    byte chunks, yielding one item at a time. Only the text of the item being
+    decoded is kept in memory, however large the document is.
+
+    The first object key matching key is used, at any depth."""
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buffer = ''
+    position = 0
+
+    def read_more():
+        nonlocal buffer
+        for chunk in chunks:
+            text = text_decoder.decode(chunk)
+            if text:
+                buffer += text
+                return True
+        return False
+
+    # Scan for `"key": [` outside of string literals.
+    in_string = False
+    escaped = False
+    string_start = 0
+    last_string = None
+    expecting = None
+    found = False
+    while not found:
+        if position >= len(buffer):
+            # Keep any partially read string so it can be compared once complete.
+            keep = string_start if in_string else position
+            buffer, position, string_start = buffer[keep:], position - keep, string_start - keep
+            if not read_more():
+                raise ValueError(f"'{key}' array not found in response")
+            continue
+
+        char = buffer[position]
+        position += 1
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+                last_string = buffer[string_start:position - 1]
+        elif char == '"':
+            in_string = True
+            string_start = position
+            expecting = None
+        elif char == ':' and last_string == key:
+            expecting = '['
+        elif char == '[' and expecting == '[':
+            found = True
+        elif not char.isspace():
+            last_string = None
+            expecting = None
+
+    # Decode array items one by one.
+    while True:
+        while position < len(buffer) and (buffer[position].isspace() or buffer[position] == ','):
+            position += 1
+        if position >= len(buffer):
+            buffer, position = '', 0
+            if not read_more():
+                raise ValueError(f"Unexpected end of '{key}' array")
+            continue
+        if buffer[position] == ']':
+            return
+
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            buffer, position = buffer[position:], 0
+            if not read_more():
+                raise
+            continue
+
+        # A scalar at the very end of the buffer may still be incomplete.
+        if end >= len(buffer):
+            buffer, position = buffer[position:], 0
+            if read_more():
+                continue
+            end = len(buffer)
+
+        position = end
+        yield item
+
+def chunked(iterable, size: int):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
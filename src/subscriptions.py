@@ -0,0 +1,87 @@
+import time
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ThreadPoolExecutor
+
+from .logger import setup_logger
+from .pocketcasts import APIError, best_match, normalize
+
+logger = setup_logger('subscriptions_logger', 'pocketcasts_errors.log')
+
+DEFAULT_MAX_WORKERS = 8
+# Search results rarely change; a week keeps re-imports almost free.
+SEARCH_CACHE_TTL = 7 * 24 * 3600
+
+def parse_opml(source: str) -> list[dict]:
+    """Reads feeds from an OPML file path or document string. Returns
+    [{"title": ..., "author": ..., "url": ...}] for every outline with a
+    feed URL; author is only present when the exporting app included it."""
+    if source.lstrip().startswith('<'):
+        root = ElementTree.fromstring(source)
+    else:
+        root = ElementTree.parse(source).getroot()
+
+    feeds = []
+    for outline in root.iter('outline'):
+        url = outline.get('xmlUrl')
+        if not url:
+            continue
+        feeds.append({
+            'title': outline.get('title') or outline.get('text') or '',
+            'author': outline.get('author') or outline.get('itunes:author'),
+            'url': url,
+        })
+
+    return feeds
+
+def resolve_feeds(client, store, feeds: list[dict], max_workers: int = DEFAULT_MAX_WORKERS,
+                  ttl: float = SEARCH_CACHE_TTL) -> dict:
+    """Maps each feed title to a podcast UUID (or None). Searches are cached
+    per normalized title, so only titles not seen within ttl hit the API,
+    and those are searched concurrently."""
+    now = time.time()
+    terms = sorted({ normalize(feed['title']) for feed in feeds if feed['title'] })
+    results = store.get_cached_searches(terms, ttl, now)
+
+    missing = [ term for term in terms if term not in results ]
+    if missing:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            searched = dict(zip(missing, executor.map(client.search_podcasts, missing)))
+        # Failed searches come back without a podcasts key and are not cached.
+        fresh = { term: result['podcasts'] for term, result in searched.items() if 'podcasts' in result }
+        store.cache_searches(fresh, now)
+        results.update(fresh)
+
+    resolved = {}
+    for feed in feeds:
+        match = best_match(results.get(normalize(feed['title'])) or [], feed['title'], feed.get('author'))
+        resolved[feed['title']] = match['uuid'] if match else None
+
+    return resolved
+
+def import_subscriptions(client, store, feeds: list[dict], max_workers: int = DEFAULT_MAX_WORKERS,
+                         ttl: float = SEARCH_CACHE_TTL) -> dict:
+    """Subscribes to every feed that resolves to a podcast the account is
+    not already subscribed to. Raises APIError when the current
+    subscriptions cannot be fetched."""
+    current = client.get_subscriptions()
+    # A failed request comes back without a podcasts key; treating that as
+    # "no subscriptions" would resubscribe to everything.
+    if 'podcasts' not in current:
+        raise APIError('Could not fetch the current subscriptions.')
+    resolved = resolve_feeds(client, store, feeds, max_workers, ttl)
+    subscribed = { podcast['uuid'] for podcast in current['podcasts'] }
+
+    to_add = sorted({ uuid for uuid in resolved.values() if uuid and uuid not in subscribed })
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        responses = list(executor.map(client.add_subscription, to_add))
+
+    failed = [ uuid for uuid, response in zip(to_add, responses) if not response ]
+    for uuid in failed:
+        logger.error(f'Could not subscribe to podcast {uuid}.')
+
+    return {
+        'added': len(to_add) - len(failed),
+        'already_subscribed': len({ uuid for uuid in resolved.values() if uuid in subscribed }),
+        'failed': failed,
+        'unresolved': [ title for title, uuid in resolved.items() if uuid is None ],
+    }
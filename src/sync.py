@@ -0,0 +1,143 @@
+import hashlib
+import json
+import urllib3
+
+from .logger import setup_logger
+from .metrics import get_metrics
+from .pocketcasts import APIError
+from .streaming import chunked
+
+logger = setup_logger('sync_logger', 'pocketcasts_errors.log')
+
+HISTORY_STATE = 'history'
+# Consecutive already-stored episodes after which the rest of the history is
+# taken to be old, and how many episodes are looked up at a time.
+STORED_RUN = 10
+LOOKUP_WINDOW = 100
+
+def response_fingerprint(response) -> str:
+    etag = response.headers.get('ETag') if response.headers else None
+    if etag:
+        return f'etag:{etag}'
+
+    return f'sha256:{hashlib.sha256(response.data).hexdigest()}'
+
+def iter_new_episodes(episodes, store, last_episode_uuid: str = None, stored_run: int = STORED_RUN,
+                      window: int = LOOKUP_WINDOW):
+    """History is ordered by last play, so an episode resumed or replayed
+    since the last sync moves back to the top, above or between new ones.
+    Episodes are yielded until stored_run in a row are already stored. The
+    run only counts once last_episode_uuid, the newest episode of the last
+    sync, has gone by, since anything above it may have been played since."""
+    passed_mark = not last_episode_uuid
+    run = 0
+    for batch in chunked(episodes, window):
+        existing = store.get_existing_uuids([ episode['uuid'] for episode in batch ])
+        for episode in batch:
+            passed_mark = passed_mark or episode['uuid'] == last_episode_uuid
+            if episode['uuid'] in existing and passed_mark:
+                run += 1
+                if run >= stored_run:
+                    return
+            else:
+                run = 0
+            yield episode
+
+def take_new_episodes(episodes: list[dict], store, last_episode_uuid: str = None,
+                      stored_run: int = STORED_RUN) -> list[dict]:
+    return list(iter_new_episodes(episodes, store, last_episode_uuid, stored_run))
+
+def record_summary(summary: dict) -> dict:
+    metrics = get_metrics()
+    metrics.increment('syncs_total', skipped=summary['skipped'])
+    for result in ('inserted', 'updated', 'unchanged'):
+        if summary[result]:
+            metrics.increment('records_total', summary[result], result=result)
+    return summary
+
+def sync_history(client, store, stream=False, chunk_size=500) -> dict:
+    """Saves new history records. skipped means the API reported nothing
+    new; failures raise APIError, so they are never mistaken for that."""
+    metrics = get_metrics()
+    with metrics.timer('stage_seconds', stage='sync'):
+        return record_summary(_sync_history(client, store, stream, chunk_size))
+
+def _sync_history(client, store, stream, chunk_size) -> dict:
+    metrics = get_metrics()
+    summary = { 'skipped': False, 'inserted': 0, 'updated': 0, 'unchanged': 0 }
+    state = store.get_sync_state(HISTORY_STATE)
+    fingerprint = state.get('fingerprint') or ''
+
+    etag = fingerprint[len('etag:'):] if fingerprint.startswith('etag:') else None
+    if stream:
+        return sync_history_stream(client, store, state, etag, summary, chunk_size)
+
+    with metrics.timer('stage_seconds', stage='fetch'):
+        response = client.get_history_response(etag=etag)
+
+    if response.status == 304:
+        logger.info('History not modified since last sync.')
+        summary['skipped'] = True
+        return summary
+
+    new_fingerprint = response_fingerprint(response)
+    if new_fingerprint == fingerprint:
+        logger.info('History payload unchanged since last sync.')
+        summary['skipped'] = True
+        return summary
+
+    try:
+        with metrics.timer('stage_seconds', stage='decode'):
+            episodes = json.loads(response.data).get('episodes', [])
+    except json.JSONDecodeError as e:
+        logger.error(f'Failed to decode JSON response from history API: {response.data}')
+        raise APIError('Failed to decode JSON response from history API.') from e
+
+    with metrics.timer('stage_seconds', stage='diff'):
+        new_episodes = take_new_episodes(episodes, store, state.get('last_episode_uuid'))
+    with metrics.timer('stage_seconds', stage='insert'):
+        summary.update(store.upsert_records(new_episodes))
+
+    last_episode_uuid = episodes[0]['uuid'] if episodes else state.get('last_episode_uuid')
+    store.set_sync_state(HISTORY_STATE, last_episode_uuid, new_fingerprint)
+
+    return summary
+
+def sync_history_stream(client, store, state, etag, summary, chunk_size) -> dict:
+    """Streaming variant of sync_history. Episodes are decoded one at a time
+    and the download stops once only stored episodes are left. Without the
+    full body no content hash is available, so only an ETag can
+    short-circuit the sync."""
+    response = client.get_history_response(etag=etag, stream=True)
+    if response.status == 304:
+        response.release_conn()
+        summary['skipped'] = True
+        return summary
+
+    new_etag = response.headers.get('ETag') if response.headers else None
+    episodes = client.stream_response_items(response, 'episodes')
+
+    newest = []
+    def track_newest(episodes):
+        for episode in episodes:
+            if not newest:
+                newest.append(episode['uuid'])
+            yield episode
+
+    new_episodes = iter_new_episodes(track_newest(episodes), store, state.get('last_episode_uuid'))
+    try:
+        # Fetching, decoding and inserting are interleaved when streaming.
+        with get_metrics().timer('stage_seconds', stage='stream'):
+            summary.update(store.save_record_stream(new_episodes, chunk_size))
+    except (urllib3.exceptions.HTTPError, ValueError) as e:
+        # Nothing is saved and the sync state stays put, so the next sync
+        # starts over.
+        logger.error(f'Failed to stream history: {e}')
+        raise APIError(f'Failed to stream history: {e}') from e
+    finally:
+        episodes.close()
+
+    last_episode_uuid = newest[0] if newest else state.get('last_episode_uuid')
+    store.set_sync_state(HISTORY_STATE, last_episode_uuid, f'etag:{new_etag}' if new_etag else None)
+
+    return summary
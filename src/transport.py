@@ -0,0 +1,240 @@
+import base64
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import urllib3
+from urllib3.util.retry import Retry
+
+from .logger import setup_logger
+from .metrics import get_metrics
+
+logger = setup_logger('transport_logger', 'pocketcasts_errors.log')
+
+DEFAULT_TIMEOUT = urllib3.Timeout(connect=5.0, read=30.0)
+# Transient statuses worth retrying. Pocket Casts uses POST for reads, so
+# POST is retried as well; the endpoints this client calls are idempotent.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_METHODS = frozenset(('GET', 'HEAD', 'POST'))
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30.0
+# Path segments that identify a resource (UUIDs, numeric IDs) are collapsed
+# so every podcast shares one circuit.
+ID_SEGMENT = re.compile(r'/(?=[0-9a-fA-F-]*\d)[0-9a-fA-F-]{8,}(?=/|$)')
+
+class CircuitOpenError(urllib3.exceptions.HTTPError):
+    """Raised without touching the network while an endpoint's circuit is open."""
+
+class CassetteMissError(urllib3.exceptions.HTTPError):
+    """Raised in replay mode for a request that was never recorded."""
+
+class JitteredRetry(Retry):
+    """urllib3 Retry with up to `jitter` random seconds added to each
+    backoff, so clients that failed together do not retry in lockstep."""
+    def __init__(self, *args, jitter: float = 0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.jitter = jitter
+
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.jitter = self.jitter
+        return retry
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        if backoff <= 0:
+            return backoff
+        return backoff + random.uniform(0, self.jitter)
+
+def default_retries(total: int = 3, backoff_factor: float = 0.5, jitter: float = 0.5,
+                    statuses=RETRY_STATUSES) -> JitteredRetry:
+    # raise_on_status=False hands the last response back once retries run
+    # out, so callers still see the status code.
+    return JitteredRetry(
+        total=total, backoff_factor=backoff_factor, jitter=jitter, status_forcelist=statuses,
+        allowed_methods=RETRY_METHODS, respect_retry_after_header=True, raise_on_status=False,
+    )
+
+def endpoint_key(method: str, url: str) -> str:
+    parts = urlsplit(url)
+    return f'{method} {parts.netloc}{ID_SEGMENT.sub("/{id}", parts.path)}'
+
+class CircuitBreaker():
+    """Stops calling an endpoint after failure_threshold consecutive
+    failures. Once reset_timeout has passed a single trial request is let
+    through: success closes the circuit, failure keeps it open for another
+    reset_timeout."""
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = {}
+        self.opened_at = {}
+        self.lock = threading.Lock()
+
+    def allow(self, key: str) -> bool:
+        with self.lock:
+            opened_at = self.opened_at.get(key)
+            if opened_at is None:
+                return True
+            if self.clock() - opened_at < self.reset_timeout:
+                return False
+            # Half open: this caller is the trial, everyone else keeps waiting.
+            self.opened_at[key] = self.clock()
+            return True
+
+    def record(self, key: str, success: bool):
+        with self.lock:
+            if success:
+                self.failures.pop(key, None)
+                self.opened_at.pop(key, None)
+                return
+
+            self.failures[key] = self.failures.get(key, 0) + 1
+            if self.failures[key] >= self.failure_threshold:
+                if key not in self.opened_at:
+                    logger.error(f'Circuit opened for {key} after {self.failures[key]} failures.')
+                    get_metrics().increment('circuit_opened_total', endpoint=key)
+                self.opened_at[key] = self.clock()
+
+    def is_open(self, key: str) -> bool:
+        with self.lock:
+            return key in self.opened_at
+
+class RecordedResponse():
+    """Response served from a cassette. Mirrors the parts of
+    urllib3.HTTPResponse the client uses, including stream()."""
+    def __init__(self, status: int, headers: dict, data: bytes):
+        self.status = status
+        self.headers = urllib3.response.HTTPHeaderDict(headers)
+        self.data = data
+        self._body = io.BytesIO(data)
+
+    def stream(self, amt=2 ** 16, decode_content=None):
+        while True:
+            chunk = self._body.read(amt)
+            if not chunk:
+                break
+            yield chunk
+
+    def read(self, amt=None, decode_content=None):
+        return self._body.read(amt)
+
+    def release_conn(self):
+        pass
+
+    def close(self):
+        pass
+
+class Cassette():
+    """Recorded request/response pairs in a JSON file. Requests match on
+    method, URL, body and conditional headers; repeats of the same request
+    are served in recorded order, the last one indefinitely."""
+    CONDITIONAL_HEADERS = ('If-None-Match', 'If-Modified-Since')
+
+    def __init__(self, path: str):
+        self.path = path
+        self.interactions = []
+        self.positions = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                self.interactions = json.load(file)['interactions']
+
+    def key(self, method, url, headers, body) -> str:
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        conditions = { name: value for name, value in (headers or {}).items() if name in self.CONDITIONAL_HEADERS }
+        return json.dumps([method, url, hashlib.sha256(body or b'').hexdigest(), conditions], sort_keys=True)
+
+    def record(self, key: str, status: int, headers: dict, data: bytes):
+        with self.lock:
+            self.interactions.append({
+                'key': key,
+                'status': status,
+                'headers': dict(headers),
+                'body': base64.b64encode(data).decode('ascii'),
+            })
+            temporary = f'{self.path}.tmp'
+            with open(temporary, 'w', encoding='utf-8') as file:
+                json.dump({ 'interactions': self.interactions }, file)
+            os.replace(temporary, self.path)
+
+    def play(self, key: str) -> RecordedResponse:
+        with self.lock:
+            matches = [ interaction for interaction in self.interactions if interaction['key'] == key ]
+            if not matches:
+                raise CassetteMissError(f'No recorded response for {key}')
+            position = self.positions.get(key, 0)
+            self.positions[key] = position + 1
+            interaction = matches[min(position, len(matches) - 1)]
+        return RecordedResponse(interaction['status'], interaction['headers'], base64.b64decode(interaction['body']))
+
+class Transport():
+    """Drop-in replacement for urllib3.PoolManager shared by every API
+    client: verified TLS, timeouts, retries with jittered backoff and a
+    circuit breaker per endpoint. With a cassette it can also record every
+    response, or replay them without any network access."""
+    def __init__(self, http=None, retries=None, timeout=DEFAULT_TIMEOUT, breaker=None,
+                 cassette: str = None, mode: str = None, **pool_kwargs):
+        if mode not in (None, 'record', 'replay'):
+            raise ValueError(f"Unknown transport mode '{mode}'. Choose record or replay.")
+        if mode and not cassette:
+            raise ValueError(f'A cassette file is needed to {mode} responses.')
+
+        self.http = http or urllib3.PoolManager(cert_reqs='CERT_REQUIRED', **pool_kwargs)
+        self.retries = retries if retries is not None else default_retries()
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.mode = mode
+        self.cassette = Cassette(cassette) if mode else None
+
+    def request(self, method, url, headers=None, body=None, preload_content=True, **kwargs):
+        if self.mode == 'replay':
+            return self.cassette.play(self.cassette.key(method, url, headers, body))
+
+        key = endpoint_key(method, url)
+        if not self.breaker.allow(key):
+            raise CircuitOpenError(f'Circuit open for {key}, not sending request.')
+
+        kwargs.setdefault('retries', self.retries)
+        kwargs.setdefault('timeout', self.timeout)
+        try:
+            response = self.http.request(
+                method, url, headers=headers, body=body, preload_content=preload_content, **kwargs
+            )
+        except urllib3.exceptions.HTTPError:
+            self.breaker.record(key, False)
+            raise
+        self.breaker.record(key, response.status < 500)
+
+        if self.mode == 'record':
+            data = response.data if preload_content else response.read()
+            response.release_conn()
+            self.cassette.record(self.cassette.key(method, url, headers, body), response.status, response.headers, data)
+            return RecordedResponse(response.status, response.headers, data)
+
+        return response
+
+    def clear(self):
+        if hasattr(self.http, 'clear'):
+            self.http.clear()
+
+def create_transport(max_workers: int = 8, **kwargs) -> Transport:
+    """Transport configured from the environment. HTTP_CASSETTE names a
+    cassette file and HTTP_CASSETTE_MODE (record or replay) what to do with
+    it; HTTP_RETRIES and HTTP_TIMEOUT override the defaults."""
+    kwargs.setdefault('mode', os.environ.get('HTTP_CASSETTE_MODE') or None)
+    kwargs.setdefault('cassette', os.environ.get('HTTP_CASSETTE'))
+    if 'HTTP_RETRIES' in os.environ:
+        kwargs.setdefault('retries', default_retries(total=int(os.environ['HTTP_RETRIES'])))
+    if 'HTTP_TIMEOUT' in os.environ:
+        kwargs.setdefault('timeout', urllib3.Timeout(connect=5.0, read=float(os.environ['HTTP_TIMEOUT'])))
+    return Transport(maxsize=max_workers, block=True, **kwargs)
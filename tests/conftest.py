@@ -1,8 +1,73 @@
 import pytest
 import json
+import logging
+import os
+import threading
+import time
 
 from src.sqlite_store import SQLiteStore
 
+class FakeResponse():
+    def __init__(self, data, status=200, headers=None):
+        self.data = data
+        self.status = status
+        self.headers = headers or {}
+        self.released = False
+        self.drained = False
+        self.closed = False
+
+    def stream(self, amt):
+        for start in range(0, len(self.data), amt):
+            yield self.data[start:start + amt]
+
+    def drain_conn(self):
+        self.drained = True
+
+    def release_conn(self):
+        self.released = True
+
+    def close(self):
+        self.closed = True
+
+class FakeHTTP():
+    def __init__(self, routes, delay=0):
+        self.routes = routes
+        self.delay = delay
+        self.requests = []
+        self.responses = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def request(self, method, url, headers=None, body=None, **kwargs):
+        with self.lock:
+            self.requests.append((method, url, headers))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        response = FakeResponse(self.routes[url])
+        self.responses.append(response)
+        return response
+
+@pytest.fixture(autouse=True)
+def log_to_tmp_path(tmp_path, monkeypatch):
+    # Module loggers append to pocketcasts_errors.log in the working
+    # directory; point them at tmp_path so tests leave the tree untouched.
+    handlers = [
+        handler
+        for logger in list(logging.Logger.manager.loggerDict.values())
+        for handler in getattr(logger, 'handlers', [])
+        if isinstance(handler, logging.FileHandler)
+    ]
+    for handler in handlers:
+        handler.close()
+        monkeypatch.setattr(handler, 'baseFilename', str(tmp_path / os.path.basename(handler.baseFilename)))
+    yield
+    for handler in handlers:
+        handler.close()
+
 @pytest.fixture
 def data_store(scope='module'):
     store = SQLiteStore(':memory:')
@@ -0,0 +1,59 @@
+import json
+import os
+
+import pytest
+
+from src.accounts import account_db_path, load_accounts, sync_accounts
+from src.sqlite_store import SQLiteStore
+from tests.conftest import FakeResponse
+
+class AccountsHTTP():
+    def __init__(self, histories):
+        self.histories = histories
+
+    def request(self, method, url, headers=None, body=None, **kwargs):
+        if url.endswith('/user/login'):
+            user = json.loads(body)['email']
+            if user not in self.histories:
+                return FakeResponse(b'{"errorMessage": "bad login"}')
+            return FakeResponse(json.dumps({ 'token': f'token-{user}' }).encode())
+
+        user = headers['Authorization'][len('Bearer token-'):]
+        return FakeResponse(json.dumps(self.histories[user]).encode())
+
+def test_load_accounts(tmp_path):
+    path = tmp_path / 'accounts.json'
+    path.write_text(json.dumps([{ 'username': 'a@example.com', 'password': 'pw', 'name': 'alice' }]))
+
+    accounts = load_accounts(str(path))
+    assert account_db_path('data', accounts[0]) == os.path.join('data', 'alice.db')
+    assert account_db_path('data', { 'username': 'b@example.com' }) == os.path.join('data', 'b_example.com.db')
+
+def test_sync_accounts(tmp_path, dataset1, dataset2):
+    http = AccountsHTTP({ 'a@example.com': dataset1, 'b@example.com': dataset2 })
+    accounts = [
+        { 'username': 'a@example.com', 'password': 'pw' },
+        { 'username': 'b@example.com', 'password': 'pw' },
+        { 'username': 'c@example.com', 'password': 'pw' },
+    ]
+
+    summary = sync_accounts(accounts, str(tmp_path), max_workers=2, http=http)
+
+    assert summary['totals'] == { 'accounts': 3, 'failed': 1, 'inserted': 200, 'updated': 0, 'unchanged': 0 }
+    assert summary['results'][2]['error'] == 'Login failed.'
+
+    store = SQLiteStore(account_db_path(str(tmp_path), accounts[0]))
+    assert len(store.get_records()) == 100
+    store.close()
+
+def test_sync_accounts_rejects_shared_database(tmp_path):
+    accounts = [
+        { 'username': 'a+b@example.com', 'password': 'pw' },
+        { 'username': 'a_b@example.com', 'password': 'pw' },
+    ]
+
+    with pytest.raises(ValueError, match='would share'):
+        sync_accounts(accounts, str(tmp_path), http=AccountsHTTP({}))
+
+    accounts[1]['name'] = 'second'
+    assert account_db_path(str(tmp_path), accounts[0]) != account_db_path(str(tmp_path), accounts[1])
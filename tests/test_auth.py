@@ -0,0 +1,91 @@
+import base64
+import json
+import threading
+import time
+
+from src.auth import CachedLogin, TokenCache, token_expiry
+from src.pocketcasts import PocketCastsClient
+from tests.conftest import FakeResponse
+
+LOGIN_URL = 'https://api.pocketcasts.com/user/login'
+HISTORY_URL = 'https://api.pocketcasts.com/user/history'
+
+def make_jwt(exp):
+    payload = base64.urlsafe_b64encode(json.dumps({ 'exp': exp }).encode()).decode().rstrip('=')
+    return f'header.{payload}.signature'
+
+class LoginHTTP():
+    """Issues a new token on every login and accepts only the newest one."""
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.logins = 0
+        self.valid_token = None
+        self.rejected = []
+        self.lock = threading.Lock()
+
+    def request(self, method, url, headers=None, body=None, **kwargs):
+        if url == LOGIN_URL:
+            time.sleep(self.delay)
+            with self.lock:
+                self.logins += 1
+                self.valid_token = make_jwt(time.time() + 3600) + str(self.logins)
+            return FakeResponse(json.dumps({ 'token': self.valid_token }).encode())
+
+        if headers['Authorization'] != f'Bearer {self.valid_token}':
+            response = FakeResponse(b'{}', status=401)
+            self.rejected.append(response)
+            return response
+        return FakeResponse(b'{"episodes": []}')
+
+def test_token_expiry_reads_jwt():
+    assert token_expiry(make_jwt(1234)) == 1234
+    assert token_expiry('opaque', default_ttl=100) > time.time() + 90
+
+def test_token_cache_reused_across_instances(tmp_path):
+    path = str(tmp_path / 'tokens.json')
+    http = LoginHTTP()
+
+    assert TokenCache(path).get_token(http, 'user', 'pw') == TokenCache(path).get_token(http, 'user', 'pw')
+    assert http.logins == 1
+
+def test_expired_token_not_reused(tmp_path):
+    cache = TokenCache(str(tmp_path / 'tokens.json'))
+    cache.set('user', make_jwt(time.time() - 10))
+
+    assert cache.get('user') is None
+
+def test_single_flight_login(tmp_path):
+    cache = TokenCache(str(tmp_path / 'tokens.json'))
+    http = LoginHTTP(delay=0.05)
+    tokens = []
+
+    threads = [ threading.Thread(target=lambda: tokens.append(cache.get_token(http, 'user', 'pw'))) for _ in range(8) ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert http.logins == 1
+    assert len(set(tokens)) == 1
+
+def test_client_logs_in_again_after_401(tmp_path):
+    cache = TokenCache(str(tmp_path / 'tokens.json'))
+    cache.set('user', make_jwt(time.time() + 3600))
+    http = LoginHTTP()
+    client = PocketCastsClient(None, http, login=CachedLogin(http, 'user', 'pw', cache))
+
+    assert client.get_history() == { 'episodes': [] }
+    assert http.logins == 1
+    assert cache.get('user') == http.valid_token
+
+def test_rejected_stream_is_drained_before_reuse(tmp_path):
+    cache = TokenCache(str(tmp_path / 'tokens.json'))
+    cache.set('user', make_jwt(time.time() + 3600))
+    http = LoginHTTP()
+    client = PocketCastsClient(None, http, login=CachedLogin(http, 'user', 'pw', cache))
+
+    assert list(client.iter_history()) == []
+
+    # The unread 401 body must not go back to the pool with its connection.
+    rejected = http.rejected[0]
+    assert rejected.drained and rejected.released
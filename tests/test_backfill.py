@@ -0,0 +1,107 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import urllib3
+
+from src.backfill import HOST_COOLDOWN, MAX_HOST_FAILURES, fetch_size, run_backfill
+
+class FileHandler(BaseHTTPRequestHandler):
+    """/head/<n> answers HEAD with a size, /range/<n> only answers Range
+    requests, anything else fails."""
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        kind, size = self.path.strip('/').split('/')
+        if kind == 'head':
+            self.send_response(200)
+            self.send_header('Content-Length', size)
+        else:
+            self.send_response(405 if kind == 'range' else 500)
+            self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        kind, size = self.path.strip('/').split('/')
+        if kind == 'range' and self.headers.get('Range') == 'bytes=0-0':
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes 0-0/{size}')
+            self.send_header('Content-Length', '1')
+            self.end_headers()
+            self.wfile.write(b'x')
+        else:
+            self.send_response(500)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+@pytest.fixture
+def file_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FileHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+def test_fetch_size(file_server):
+    http = urllib3.PoolManager()
+
+    assert fetch_size(http, f'{file_server}/head/1234') == 1234
+    assert fetch_size(http, f'{file_server}/range/5678') == 5678
+    with pytest.raises(ValueError):
+        fetch_size(http, f'{file_server}/broken/1')
+
+def test_run_backfill(data_store, dataset1, file_server):
+    episodes = [ dict(episode, size='0') for episode in dataset1['episodes'][:6] ]
+    urls = ['head/100', 'range/200', 'broken/1', 'head/300', 'range/400', 'head/500']
+    for episode, path in zip(episodes, urls):
+        episode['url'] = f'{file_server}/{path}'
+    data_store.save_records(episodes)
+
+    summary = run_backfill(data_store, max_workers=4, batch_size=4)
+
+    assert summary == { 'updated': 5, 'failed': 1, 'skipped': 0 }
+    assert len(data_store.get_zero_size_records()) == 1
+    cursor = data_store.db_connection.cursor()
+    cursor.execute('SELECT SUM(Size) FROM Listening_History')
+    assert cursor.fetchone()[0] == 1500
+
+def test_run_backfill_skips_failing_hosts(data_store, dataset1):
+    episodes = [ dict(episode, size='0', url='http://127.0.0.1:9/missing') for episode in dataset1['episodes'][:2] ]
+    data_store.save_records(episodes)
+    for _ in range(MAX_HOST_FAILURES):
+        data_store.record_host_results({ '127.0.0.1': 'refused' }, set(), time.time(), HOST_COOLDOWN)
+
+    summary = run_backfill(data_store)
+
+    assert summary == { 'updated': 0, 'failed': 0, 'skipped': 2 }
+
+def test_host_bans_expire(data_store):
+    long_ago = time.time() - 2 * HOST_COOLDOWN
+    for _ in range(MAX_HOST_FAILURES):
+        data_store.record_host_results({ 'example.com': 'refused' }, set(), long_ago, HOST_COOLDOWN)
+
+    assert data_store.get_failed_hosts(MAX_HOST_FAILURES, time.time()) == set()
+
+    # A host that also answered in the same batch is not failing.
+    for _ in range(MAX_HOST_FAILURES):
+        data_store.record_host_results({ 'cdn.example.com': 'timeout' }, { 'cdn.example.com' }, time.time(), HOST_COOLDOWN)
+    assert data_store.get_failed_hosts(MAX_HOST_FAILURES, time.time()) == set()
+
+def test_dead_url_does_not_ban_its_host(data_store, dataset1, file_server):
+    episodes = [ dict(episode, size='0') for episode in dataset1['episodes'][:15] ]
+    for index, episode in enumerate(episodes):
+        episode['url'] = f'{file_server}/head/{index + 1}'
+    episodes[4]['url'] = f'{file_server}/broken/1'
+    data_store.save_records(episodes[:5])
+
+    summaries = [ run_backfill(data_store, max_workers=2) for _ in range(MAX_HOST_FAILURES) ]
+
+    assert summaries[0] == { 'updated': 4, 'failed': 1, 'skipped': 0 }
+    # The dead URL waits out its own cooldown instead of failing every run.
+    assert summaries[1] == summaries[2] == { 'updated': 0, 'failed': 0, 'skipped': 1 }
+
+    data_store.save_records(episodes[5:])
+    assert run_backfill(data_store, max_workers=2) == { 'updated': 10, 'failed': 0, 'skipped': 1 }
@@ -0,0 +1,24 @@
+from benchmarks.run import compare, run_benchmarks
+from benchmarks.synthetic import generate_history
+
+def test_generate_history_matches_schema(dataset1):
+    history = generate_history(500, seed=1)
+
+    assert history['total'] == 500
+    assert set(history['episodes'][0]) == set(dataset1['episodes'][0])
+    assert len({ episode['uuid'] for episode in history['episodes'] }) == 500
+    assert generate_history(500, seed=1) == history
+
+def test_compare_flags_regressions():
+    baseline = { 'save_records': 0.1, 'get_records': 0.001 }
+
+    assert compare({ 'save_records': 0.12, 'get_records': 0.001 }, baseline, 0.5) == []
+    assert len(compare({ 'save_records': 0.2, 'get_records': 0.001 }, baseline, 0.5)) == 1
+    # Below the noise floor.
+    assert compare({ 'get_records': 0.004 }, baseline, 0.5) == []
+
+def test_run_benchmarks_small():
+    results = run_benchmarks(size=200, repeat=1)
+
+    assert set(results) >= { 'save_records', 'diff_records', 'get_records', 'get_records_by_uuid', 'sync_end_to_end' }
+    assert all(seconds >= 0 for seconds in results.values())
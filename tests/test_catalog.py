@@ -0,0 +1,86 @@
+import json
+import threading
+
+from src.catalog import Catalog, LRUCache
+from tests.conftest import FakeResponse
+
+PODCAST = {
+    'podcast': {
+        'uuid': 'pod-1',
+        'title': 'Odd Lots',
+        'author': 'Bloomberg',
+        'episodes': [
+            { 'uuid': 'ep-1', 'title': 'First', 'url': 'https://example.com/1.mp3', 'file_size': 100, 'duration': 60 },
+            { 'uuid': 'ep-2', 'title': 'Second', 'url': 'https://example.com/2.mp3', 'file_size': 200, 'duration': 120 },
+        ],
+    }
+}
+
+class CatalogClient():
+    def __init__(self):
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def get_podcast_response(self, podcast_uuid, etag=None, last_modified=None):
+        with self.lock:
+            self.requests.append((podcast_uuid, etag, last_modified))
+        if etag == '"v1"':
+            return FakeResponse(b'', status=304)
+        return FakeResponse(
+            json.dumps(PODCAST).encode(), headers={ 'ETag': '"v1"', 'Last-Modified': 'Sat, 01 Jan 2022 00:00:00 GMT' }
+        )
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+def test_catalog_serves_lookups_locally(data_store):
+    client = CatalogClient()
+    catalog = Catalog(client, data_store)
+
+    assert catalog.get_episodes('pod-1') == { 'First': 'ep-1', 'Second': 'ep-2' }
+    assert catalog.get_episode_uuid('pod-1', 'Second') == 'ep-2'
+    assert catalog.get_episode('ep-1')['size'] == 100
+    assert catalog.get_episode('missing') == {}
+    assert client.requests == [('pod-1', None, None)]
+
+    # A fresh catalog on the same database still needs no network.
+    assert Catalog(client, data_store).get_episodes('pod-1') == { 'First': 'ep-1', 'Second': 'ep-2' }
+    assert len(client.requests) == 1
+
+def test_catalog_memory_hits_skip_the_database(data_store, monkeypatch):
+    catalog = Catalog(CatalogClient(), data_store)
+    catalog.get_episodes('pod-1')
+
+    def no_query(*args):
+        raise AssertionError('memory hit queried the database')
+    monkeypatch.setattr(data_store, 'get_podcast', no_query)
+    monkeypatch.setattr(data_store, 'get_podcast_episodes', no_query)
+
+    assert catalog.get_episodes('pod-1') == { 'First': 'ep-1', 'Second': 'ep-2' }
+
+def test_catalog_revalidates_stale_podcasts(data_store):
+    client = CatalogClient()
+    catalog = Catalog(client, data_store, max_age=0)
+
+    catalog.get_episodes('pod-1')
+    assert catalog.get_episodes('pod-1') == { 'First': 'ep-1', 'Second': 'ep-2' }
+
+    assert client.requests[1] == ('pod-1', '"v1"', 'Sat, 01 Jan 2022 00:00:00 GMT')
+    assert data_store.get_podcast('pod-1')['title'] == 'Odd Lots'
+
+def test_catalog_refresh_many(data_store):
+    client = CatalogClient()
+    catalog = Catalog(client, data_store)
+
+    assert catalog.refresh_many(['pod-1', 'pod-2']) == { 'fresh': 0, 'refreshed': 2, 'failed': 0 }
+    assert catalog.refresh_many(['pod-1', 'pod-2']) == { 'fresh': 2, 'refreshed': 0, 'failed': 0 }
+    assert catalog.refresh_many(['pod-1'], force=True) == { 'fresh': 0, 'refreshed': 1, 'failed': 0 }
+    assert client.requests[-1] == ('pod-1', '"v1"', 'Sat, 01 Jan 2022 00:00:00 GMT')
@@ -0,0 +1,64 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from src.cli import main
+from src.metrics import NullMetrics, get_metrics
+from src.sqlite_store import SQLiteStore
+
+@pytest.fixture
+def db_path(tmp_path, dataset1):
+    path = str(tmp_path / 'cli.db')
+    store = SQLiteStore(path)
+    store.save_records(dataset1['episodes'])
+    store.close()
+    return path
+
+def loaded_modules(code: str) -> set:
+    result = subprocess.run(
+        [sys.executable, '-c', f'import sys, json; {code}; print(json.dumps(list(sys.modules)))'],
+        capture_output=True, text=True, check=True,
+    )
+    return set(json.loads(result.stdout.splitlines()[-1]))
+
+def test_startup_skips_heavy_imports():
+    for code in ('import src.cli', 'import src.main', 'from src.cli import build_parser; build_parser()'):
+        modules = loaded_modules(code)
+        assert 'urllib3' not in modules
+        assert 'dotenv' not in modules
+        assert 'http.server' not in modules
+        assert 'src.pocketcasts' not in modules
+
+def test_stats_does_not_load_network_modules(db_path):
+    modules = loaded_modules(f"from src.cli import main; main(['stats', '--db', {db_path!r}])")
+    assert 'src.stats' in modules
+    assert 'urllib3' not in modules
+
+def test_subcommands(db_path, tmp_path, capsys):
+    assert main(['stats', '--db', db_path, '--by', 'author', '--limit', '1']) == 0
+    assert 'By author:' in capsys.readouterr().out
+
+    assert main(['search', 'blitz', '--db', db_path]) == 0
+    assert 'matches.' in capsys.readouterr().out
+
+    assert main(['export', str(tmp_path / 'exports'), '--format', 'ndjson', '--db', db_path]) == 0
+    assert len(list((tmp_path / 'exports').iterdir())) == 1
+
+def test_sync_sample(tmp_path):
+    db_path = str(tmp_path / 'sample.db')
+    assert main(['sync', '--sample', 'tests/data.json', '--db', db_path]) == 0
+
+    store = SQLiteStore(db_path)
+    assert store.get_stats_summary()['listens'] == 100
+    store.close()
+
+def test_profile(db_path, tmp_path, capsys):
+    assert main(['--profile', 'sync', '--sample', 'tests/data3.json', '--db', db_path]) == 0
+
+    report = capsys.readouterr().err
+    assert 'Imports:' in report and 'sqlite_store' in report
+    assert 'Stages:' in report and 'insert' in report
+    assert 'Total:' in report
+    assert isinstance(get_metrics(), NullMetrics) and not hasattr(get_metrics(), 'get_timers')
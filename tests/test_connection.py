@@ -0,0 +1,51 @@
+import sqlite3
+import threading
+
+import pytest
+
+from src.connection import ConnectionManager
+from src.sqlite_store import SQLiteStore
+
+def test_performance_profile(tmp_path):
+    manager = ConnectionManager(str(tmp_path / 'test.db'), 'performance')
+
+    assert manager.writer.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert manager.writer.execute('PRAGMA synchronous').fetchone()[0] == 1 # NORMAL
+    assert manager.writer.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+    manager.close()
+
+def test_unknown_profile(tmp_path):
+    with pytest.raises(ValueError):
+        ConnectionManager(str(tmp_path / 'test.db'), 'turbo')
+
+def test_readers_are_read_only(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'test.db'))
+
+    with store.connections.reader() as connection:
+        with pytest.raises(sqlite3.OperationalError):
+            connection.execute('DELETE FROM Listening_History')
+    store.close()
+
+def test_reads_do_not_wait_for_writer(tmp_path, dataset1, dataset2):
+    store = SQLiteStore(str(tmp_path / 'test.db'))
+    store.save_records(dataset1['episodes'])
+
+    # Hold a write transaction open while another thread reads.
+    store.db_connection.execute('BEGIN IMMEDIATE')
+    store.db_connection.execute('DELETE FROM Listening_History')
+    counts = []
+    reader = threading.Thread(target=lambda: counts.append(len(store.get_records(1000))))
+    reader.start()
+    reader.join(timeout=2)
+    store.db_connection.rollback()
+
+    assert counts == [100]
+    store.close()
+
+def test_reader_pool_is_bounded(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'test.db'), readers=2)
+    for _ in range(5):
+        store.get_records()
+
+    assert store.connections.opened_readers == 1
+    store.close()
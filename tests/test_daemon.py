@@ -0,0 +1,37 @@
+import threading
+
+from src.daemon import Scheduler
+
+def test_next_delay_backs_off():
+    scheduler = Scheduler(10, jitter=0, max_backoff=60)
+    assert scheduler.next_delay() == 10
+
+    scheduler.failures = 2
+    assert scheduler.next_delay() == 40
+
+    scheduler.failures = 5
+    assert scheduler.next_delay() == 60
+
+def test_next_delay_jitter():
+    scheduler = Scheduler(10, jitter=5)
+    for _ in range(20):
+        assert 10 <= scheduler.next_delay() <= 15
+
+def test_run_until_stopped():
+    scheduler = Scheduler(0)
+    calls = []
+
+    def job():
+        calls.append(len(calls))
+        if len(calls) == 2:
+            raise RuntimeError('transient')
+        if len(calls) == 4:
+            scheduler.stop()
+
+    thread = threading.Thread(target=scheduler.run, args=(job,))
+    thread.start()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert len(calls) == 4
+    assert scheduler.failures == 0
@@ -0,0 +1,77 @@
+import csv
+import gzip
+import json
+import os
+
+import pytest
+
+from src import export
+from src.export import export_history, main, resolve_format
+from src.sqlite_store import FULL_COLUMNS, SQLiteStore
+
+def read_csv(path):
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as file:
+        return list(csv.DictReader(file))
+
+def read_ndjson(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        return [ json.loads(line) for line in file ]
+
+def test_export_csv(data_store, dataset1, tmp_path):
+    data_store.save_records(dataset1['episodes'])
+
+    summary = export_history(data_store, str(tmp_path), 'csv', batch_size=30)
+    rows = read_csv(summary['path'])
+
+    assert summary['rows'] == 100 and summary['format'] == 'csv'
+    assert summary['path'].endswith('.csv.gz')
+    assert list(rows[0]) == list(FULL_COLUMNS)
+    # Oldest first, in listening order.
+    assert [ row['Episode_UUID'] for row in rows ] == [ episode['uuid'] for episode in reversed(dataset1['episodes']) ]
+    assert not [ name for name in os.listdir(tmp_path) if name.endswith('.tmp') ]
+
+def test_incremental_export(data_store, dataset2, dataset3, tmp_path):
+    data_store.save_records(dataset2['episodes'])
+    first = export_history(data_store, str(tmp_path), 'ndjson', incremental=True)
+
+    data_store.save_records(dataset3['episodes'])
+    second = export_history(data_store, str(tmp_path), 'ndjson', incremental=True)
+    third = export_history(data_store, str(tmp_path), 'ndjson', incremental=True)
+
+    exported = read_ndjson(first['path']) + read_ndjson(second['path'])
+    assert first['rows'] == 100
+    assert second['rows'] == 22
+    assert third['rows'] == 0 and third['watermark'] == second['watermark']
+    assert len({ row['ID'] for row in exported }) == len(exported) == 122
+    # Nothing new, so no empty file.
+    assert third['path'] is None
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(path) for path in (first['path'], second['path']))
+
+def test_export_falls_back_without_pyarrow(monkeypatch):
+    monkeypatch.setattr(export, 'load_pyarrow', lambda: None)
+
+    assert resolve_format('auto') == 'csv'
+    assert resolve_format('parquet') == 'csv'
+    assert resolve_format('ndjson') == 'ndjson'
+    with pytest.raises(ValueError):
+        resolve_format('xlsx')
+
+def test_export_parquet(data_store, dataset1, tmp_path):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    data_store.save_records(dataset1['episodes'])
+
+    summary = export_history(data_store, str(tmp_path), 'parquet', batch_size=40)
+    table = parquet.read_table(summary['path'])
+
+    assert table.num_rows == 100
+    assert table.column_names == list(FULL_COLUMNS)
+    assert sum(table.column('Is_Starred').to_pylist()) == sum(episode['starred'] for episode in dataset1['episodes'])
+
+def test_export_cli(dataset1, tmp_path):
+    db_path = str(tmp_path / 'cli.db')
+    store = SQLiteStore(db_path)
+    store.save_records(dataset1['episodes'])
+    store.close()
+
+    assert main([str(tmp_path / 'exports'), '--format', 'csv', '--db', db_path]) == 0
+    assert len(read_csv(str(next((tmp_path / 'exports').iterdir())))) == 100
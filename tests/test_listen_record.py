@@ -0,0 +1,36 @@
+import pytest
+
+from src.listen_record import ListenRecord
+
+def test_from_dictionaries(dataset1):
+    records = ListenRecord.From_Dictionaries(dataset1['episodes'])
+
+    assert len(records) == len(dataset1['episodes'])
+    assert records[0] == ListenRecord.From_Dictionary(dataset1['episodes'][0])
+    assert records[0].episode_uuid == dataset1['episodes'][0]['uuid']
+    assert records[0].podcast_title == dataset1['episodes'][0]['podcastTitle']
+
+def test_records_are_slotted(dataset1):
+    record = ListenRecord.From_Dictionary(dataset1['episodes'][0])
+
+    assert not hasattr(record, '__dict__')
+    with pytest.raises(AttributeError):
+        record.unknown = 1
+
+def test_hash_uses_episode_uuid(dataset1):
+    records = ListenRecord.From_Dictionaries(dataset1['episodes'] + dataset1['episodes'])
+
+    assert len(set(records)) == len(dataset1['episodes'])
+
+def test_row_factory_matches_convert_list(data_store, dataset1):
+    data_store.save_records(dataset1['episodes'])
+    records = data_store.get_listen_records()
+
+    cursor = data_store.db_connection.cursor()
+    cursor.execute('SELECT * FROM Listening_History ORDER BY Date_Saved DESC')
+    rows = cursor.fetchall()
+
+    assert records == ListenRecord.Convert_List(rows)
+    assert records[0].id == rows[0][0]
+    assert records[0].date_added == rows[0][11]
+    assert { record.episode_uuid for record in records } == { episode['uuid'] for episode in dataset1['episodes'] }
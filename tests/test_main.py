@@ -10,4 +10,6 @@ def test_diff_records(data_store: SQLiteStore, dataset2: dict, dataset3: dict, d
 
     data_store.save_records(dataset3['episodes'])
     existing_records = data_store.get_records()
-    assert len(diff_records(dataset4['episodes'], existing_records)) == (56 + 22)
\ No newline at end of file
+    # get_records now returns the newest rows, so the 22 episodes dataset3
+    # added are no longer reported as missing.
+    assert len(diff_records(dataset4['episodes'], existing_records)) == 56
\ No newline at end of file
@@ -0,0 +1,65 @@
+import logging
+import sqlite3
+import urllib.request
+
+from src.logger import enable_sqlite_logging, setup_logger
+from src.metrics import MetricsRecorder, serve_prometheus
+
+def test_metrics_written_to_sqlite(tmp_path):
+    db_path = str(tmp_path / 'metrics.db')
+    metrics = MetricsRecorder(db_path)
+
+    with metrics.timer('stage_seconds', stage='fetch'):
+        pass
+    metrics.increment('records_total', 22, result='inserted')
+    metrics.close()
+
+    connection = sqlite3.connect(db_path)
+    rows = connection.execute('SELECT Name, Kind, Value, Labels FROM Metrics ORDER BY ID').fetchall()
+    connection.close()
+
+    assert rows[0][:2] == ('stage_seconds', 'timer')
+    assert rows[0][3] == '{"stage": "fetch"}'
+    assert rows[1] == ('records_total', 'counter', 22, '{"result": "inserted"}')
+
+def test_prometheus_endpoint(tmp_path):
+    metrics = MetricsRecorder(str(tmp_path / 'metrics.db'))
+    metrics.observe('http_request_seconds', 0.25, endpoint='fetching history')
+    metrics.observe('http_request_seconds', 0.75, endpoint='fetching history')
+    metrics.increment('records_total', 3, result='inserted')
+
+    text = metrics.render_prometheus()
+    assert 'pocketcasts_http_request_seconds_count{endpoint="fetching history"} 2' in text
+    assert 'pocketcasts_http_request_seconds_sum{endpoint="fetching history"} 1.0' in text
+    assert 'pocketcasts_records_total{result="inserted"} 3' in text
+
+    server = serve_prometheus(0, '127.0.0.1')
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{server.server_port}/metrics') as response:
+            assert response.status == 200
+    finally:
+        server.shutdown()
+        metrics.close()
+
+def test_setup_logger_does_not_stack_handlers(tmp_path):
+    log_file = str(tmp_path / 'test.log')
+    setup_logger('test_logger_once', log_file)
+    logger = setup_logger('test_logger_once', log_file)
+
+    assert len(logger.handlers) == 2
+
+def test_sqlite_logging(tmp_path):
+    db_path = str(tmp_path / 'logs.db')
+    listener = enable_sqlite_logging(db_path)
+    try:
+        logging.getLogger('test_sqlite_logging').error('Something failed')
+    finally:
+        listener.stop()
+        root = logging.getLogger()
+        root.removeHandler(root.handlers[-1])
+
+    connection = sqlite3.connect(db_path)
+    rows = connection.execute('SELECT Logger, Level, Message FROM Logs').fetchall()
+    connection.close()
+
+    assert rows == [('test_sqlite_logging', 'ERROR', 'Something failed')]
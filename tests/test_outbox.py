@@ -0,0 +1,87 @@
+import threading
+import time
+
+from src.outbox import MAX_ATTEMPTS, RateLimiter, flush_outbox, send_update
+from src.pocketcasts import PocketCastsClient
+from src.transport import Transport
+from tests.conftest import FakeResponse
+
+class OutboxClient():
+    """Answers with the queued statuses per episode, then 200."""
+    def __init__(self, statuses=None):
+        self.statuses = statuses or {}
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send_episode_update(self, payload):
+        with self.lock:
+            self.sent.append(payload)
+            queued = self.statuses.get(payload['uuid'])
+            status = queued.pop(0) if queued else 200
+        return FakeResponse(b'{}', status=status, headers={ 'Retry-After': '0' })
+
+def update(uuid, **fields):
+    return dict({ 'uuid': uuid, 'podcast': 'podcast-1' }, **fields)
+
+def test_updates_are_collapsed(data_store):
+    data_store.enqueue_episode_updates([ update('a', status=2), update('b', starred=True) ])
+    data_store.enqueue_episode_updates([ update('a', status=3, position=120) ])
+
+    pending = dict((payload['uuid'], payload) for payload, _ in data_store.get_pending_updates(10, time.time(), 5))
+    assert pending['a'] == update('a', status=3, position=120)
+    assert len(pending) == 2
+
+def test_flush_outbox(data_store):
+    data_store.enqueue_episode_updates([ update(str(i), status=3) for i in range(20) ])
+    client = OutboxClient({ '3': [429], '4': [500, 500, 500], '5': [400] })
+
+    summary = flush_outbox(client, data_store, max_workers=4, rate=1000, backoff=0)
+
+    assert summary == { 'sent': 18, 'failed': 1, 'rejected': 1 }
+    remaining = data_store.db_connection.execute('SELECT Episode_UUID, Attempts FROM Episode_Outbox ORDER BY Episode_UUID').fetchall()
+    # The 400 is kept for inspection but never sent again.
+    assert remaining == [('4', 1), ('5', MAX_ATTEMPTS)]
+    assert client.sent.count(update('5', status=3)) == 1
+
+    # Failed updates wait for their retry time.
+    assert flush_outbox(client, data_store, rate=1000, backoff=0) == { 'sent': 0, 'failed': 0, 'rejected': 0 }
+
+class RateLimitedHTTP():
+    """Pool stand-in that answers 429 once and records each retry policy."""
+    def __init__(self):
+        self.retries = []
+
+    def request(self, method, url, headers=None, body=None, retries=None, **kwargs):
+        self.retries.append(retries)
+        status = 429 if len(self.retries) == 1 else 200
+        return FakeResponse(b'{}', status=status, headers={ 'Retry-After': '0' })
+
+def test_rate_limits_reach_the_outbox():
+    http = RateLimitedHTTP()
+    client = PocketCastsClient('abc', Transport(http=http))
+    limiter = RateLimiter(1000)
+    paused = []
+    limiter.pause = paused.append
+
+    assert send_update(client, limiter, update('a', status=3), backoff=0) == (None, False)
+
+    # The transport must not retry a 429 itself, or the shared limiter
+    # only hears about it after every retry is spent.
+    assert paused == [0.0]
+    assert all(429 not in retries.status_forcelist for retries in http.retries)
+
+def test_rate_limiter():
+    limiter = RateLimiter(rate=50, burst=1)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+
+    assert time.monotonic() - start >= 0.09
+
+def test_rate_limiter_pause():
+    limiter = RateLimiter(rate=1000, burst=1)
+    limiter.pause(0.1)
+    start = time.monotonic()
+    limiter.acquire()
+
+    assert time.monotonic() - start >= 0.09
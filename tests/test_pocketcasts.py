@@ -0,0 +1,111 @@
+import json
+
+import pytest
+import urllib3
+
+from src.pocketcasts import APIError, PocketCastsClient
+from src.metrics import configure_metrics
+from src.sync import sync_history
+from tests.conftest import FakeHTTP, FakeResponse
+
+class FailingHTTP():
+    def request(self, *args, **kwargs):
+        raise urllib3.exceptions.NewConnectionError(None, 'Connection refused')
+
+class PartlyFailingHTTP(FakeHTTP):
+    def request(self, method, url, headers=None, body=None, **kwargs):
+        if url.endswith('/podcast1'):
+            return FakeResponse(b'', status=503)
+        return super().request(method, url, headers, body, **kwargs)
+
+class StatusHTTP():
+    def __init__(self, status):
+        self.status = status
+        self.responses = []
+
+    def request(self, *args, **kwargs):
+        response = FakeResponse(b'{"error": "rate limited"}', status=self.status)
+        self.responses.append(response)
+        return response
+
+def podcast_payload(podcast_uuid, count):
+    episodes = [ { 'uuid': f'{podcast_uuid}-{i}', 'title': f'Episode {i}' } for i in range(count) ]
+    return json.dumps({ 'podcast': { 'uuid': podcast_uuid, 'episodes': episodes } }).encode()
+
+def test_get_history_sends_token(dataset1):
+    http = FakeHTTP({ 'https://api.pocketcasts.com/user/history': json.dumps(dataset1).encode() })
+    client = PocketCastsClient('abc', http)
+
+    assert client.get_history() == dataset1
+    assert http.requests[0][2]['Authorization'] == 'Bearer abc'
+
+def test_invalid_json_returns_default():
+    http = FakeHTTP({ 'https://api.pocketcasts.com/discover/search': b'<html>' })
+    client = PocketCastsClient('abc', http)
+
+    assert client.search_podcasts('odd lots') == {}
+
+def test_history_errors_are_raised():
+    http = FakeHTTP({ 'https://api.pocketcasts.com/user/history': b'<html>' })
+    client = PocketCastsClient('abc', http)
+
+    # An unreadable history must not look like an empty one.
+    with pytest.raises(APIError):
+        client.get_history()
+
+    http = FailingHTTP()
+    with pytest.raises(APIError):
+        PocketCastsClient('abc', http).get_history_response()
+    assert PocketCastsClient('abc', http).get_subscriptions() == {}
+
+@pytest.mark.parametrize('status', [401, 403, 429, 503])
+def test_error_statuses_are_raised(data_store, status):
+    data_store.set_sync_state('history', 'ep-1', 'etag:"v1"')
+    client = PocketCastsClient('abc', StatusHTTP(status))
+
+    # An error body must not be synced as an empty history.
+    with pytest.raises(APIError):
+        sync_history(client, data_store)
+    with pytest.raises(APIError):
+        client.get_podcast_response('pod-1')
+    assert data_store.get_sync_state('history')['fingerprint'] == 'etag:"v1"'
+
+def test_rejected_stream_is_drained():
+    http = StatusHTTP(503)
+
+    with pytest.raises(APIError):
+        PocketCastsClient('abc', http).get_history_response(stream=True)
+    assert http.responses[0].drained and http.responses[0].released
+
+def test_iter_episodes_skips_failed_podcasts():
+    uuids = [ f'podcast{i}' for i in range(4) ]
+    http = PartlyFailingHTTP({
+        f'https://podcast-api.pocketcasts.com/podcast/full/{uuid}': podcast_payload(uuid, 1) for uuid in uuids
+    })
+
+    results = dict(PocketCastsClient('abc', http, max_workers=2).iter_episodes(uuids))
+
+    assert set(results) == { 'podcast0', 'podcast2', 'podcast3' }
+
+def test_iter_episodes_runs_concurrently():
+    uuids = [ f'podcast{i}' for i in range(8) ]
+    http = FakeHTTP({
+        f'https://podcast-api.pocketcasts.com/podcast/full/{uuid}': podcast_payload(uuid, 3) for uuid in uuids
+    }, delay=0.05)
+    client = PocketCastsClient('abc', http, max_workers=4)
+
+    results = dict(client.iter_episodes(uuids))
+
+    assert set(results) == set(uuids)
+    assert results['podcast0'] == { 'Episode 0': 'podcast0-0', 'Episode 1': 'podcast0-1', 'Episode 2': 'podcast0-2' }
+    assert 1 < http.max_active <= 4
+
+def test_streamed_bytes_are_counted(dataset1):
+    body = json.dumps(dataset1).encode()
+    http = FakeHTTP({ 'https://api.pocketcasts.com/user/history': body })
+    metrics = configure_metrics(None, in_memory=True)
+    try:
+        assert len(list(PocketCastsClient('abc', http).iter_history(chunk_size=1024))) == 100
+        assert metrics.counters[('bytes_received_total', (('endpoint', 'fetching history'),))] == len(body)
+    finally:
+        configure_metrics(None)
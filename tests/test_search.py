@@ -0,0 +1,71 @@
+from src.search import main, search_history
+from src.sqlite_store import SQLiteStore, search_query
+
+def test_search_query_quotes_terms():
+    assert search_query('Churchill (and London)') == '"Churchill"* "and"* "London"*'
+    assert search_query('odd lots', prefix=False) == '"odd" "lots"'
+    assert search_query('  ') == ''
+
+def test_search_records(data_store, dataset1):
+    data_store.save_records(dataset1['episodes'])
+
+    rows = data_store.search_records('churc')
+    assert [ row[5] for row in rows ] == ['#594: How Churchill (and London) Survived the Blitz of 1940']
+    assert data_store.search_records('churc', prefix=False) == []
+
+    # Title matches rank above podcast title matches.
+    rows = data_store.search_records('uranium')
+    assert 'Uranium' in rows[0][5]
+
+    assert data_store.search_records('') == []
+
+def test_search_pagination(data_store, dataset1):
+    data_store.save_records(dataset1['episodes'])
+    total = data_store.count_search_results('manliness')
+
+    pages = [ search_history(data_store, 'manliness', page, page_size=7) for page in (1, 2, 3, 4, 5) ]
+
+    assert pages[0]['total'] == total and pages[0]['pages'] == -(-total // 7)
+    uuids = [ row[1] for page in pages for row in page['rows'] ]
+    assert len(uuids) == len(set(uuids)) == min(total, 35)
+
+def test_search_index_follows_updates(data_store, dataset1):
+    episode = dict(dataset1['episodes'][0], title='Renamed Episode Zeppelin')
+    data_store.save_records(dataset1['episodes'])
+    data_store.save_records([episode])
+
+    assert [ row[1] for row in data_store.search_records('zeppelin') ] == [episode['uuid']]
+    assert data_store.search_records('churchill') == []
+
+    data_store.db_connection.execute('DELETE FROM Listening_History WHERE Episode_UUID = ?', (episode['uuid'],))
+    assert data_store.search_records('zeppelin') == []
+
+def test_search_index_is_built_for_existing_rows(tmp_path, dataset1):
+    db_path = str(tmp_path / 'legacy.db')
+    store = SQLiteStore(db_path)
+    store.save_records(dataset1['episodes'])
+    # Simulate a database created before the search index existed.
+    store.db_connection.executescript('''
+        DROP TRIGGER history_search_insert;
+        DROP TRIGGER history_search_update;
+        DROP TRIGGER history_search_delete;
+        DROP TABLE History_Search;
+        PRAGMA user_version = 7;
+    ''')
+    store.close()
+
+    store = SQLiteStore(db_path)
+    assert store.count_search_results('churchill') == 1
+    store.close()
+
+def test_search_cli(tmp_path, dataset1, capsys):
+    db_path = str(tmp_path / 'cli.db')
+    store = SQLiteStore(db_path)
+    store.save_records(dataset1['episodes'])
+    store.close()
+
+    assert main(['blitz', '--db', db_path]) == 0
+
+    output = capsys.readouterr().out
+    assert 'How Churchill (and London) Survived the Blitz of 1940' in output
+    assert 'Page 1 of 1, 1 matches.' in output
@@ -1,3 +1,5 @@
+from src.sqlite_store import SQLiteStore
+
 def test_table_creation(data_store):
     cursor = data_store.db_connection.cursor()
 
@@ -23,16 +25,16 @@ def test_get_records(data_store, dataset1):
     records = data_store.get_records()
 
     assert len(records) == len(dataset1['episodes'])
-    assert records[0][0] == dataset1['episodes'][-1]['uuid']
-    assert records[0][1] == dataset1['episodes'][-1]['url']
-    assert records[0][2] == dataset1['episodes'][-1]['published']
-    assert records[0][3] == dataset1['episodes'][-1]['duration']
-    assert records[0][4] == dataset1['episodes'][-1]['title']
-    assert records[0][5] == int(dataset1['episodes'][-1]['size'])
-    assert records[0][6] == dataset1['episodes'][-1]['starred']
-    assert records[0][7] == dataset1['episodes'][-1]['podcastUuid']
-    assert records[0][8] == dataset1['episodes'][-1]['podcastTitle']
-    assert records[0][9] == dataset1['episodes'][-1]['author']
+    assert records[0][0] == dataset1['episodes'][0]['uuid']
+    assert records[0][1] == dataset1['episodes'][0]['url']
+    assert records[0][2] == dataset1['episodes'][0]['published']
+    assert records[0][3] == dataset1['episodes'][0]['duration']
+    assert records[0][4] == dataset1['episodes'][0]['title']
+    assert records[0][5] == int(dataset1['episodes'][0]['size'])
+    assert records[0][6] == dataset1['episodes'][0]['starred']
+    assert records[0][7] == dataset1['episodes'][0]['podcastUuid']
+    assert records[0][8] == dataset1['episodes'][0]['podcastTitle']
+    assert records[0][9] == dataset1['episodes'][0]['author']
 
 def test_get_records_by_uuid(data_store, dataset1):
     data_store.save_records(dataset1['episodes'])
@@ -43,4 +45,106 @@ def test_get_records_by_uuid(data_store, dataset1):
 
     assert len(records_by_uuid) == len(dataset1['episodes'])
     for record in records_by_uuid:
-        assert record[0] in uuids
\ No newline at end of file
+        assert record[0] in uuids
+
+def test_upsert_records(data_store, dataset2, dataset3):
+    counts = data_store.upsert_records(dataset2['episodes'])
+    assert counts == { 'inserted': 100, 'updated': 0, 'unchanged': 0 }
+
+    # dataset3 shares 78 episodes with dataset2.
+    counts = data_store.upsert_records(dataset3['episodes'])
+    assert counts == { 'inserted': 22, 'updated': 0, 'unchanged': 78 }
+
+    changed = dict(dataset3['episodes'][0], starred=not dataset3['episodes'][0]['starred'])
+    counts = data_store.upsert_records([changed] + dataset3['episodes'][1:])
+    assert counts == { 'inserted': 0, 'updated': 1, 'unchanged': 99 }
+
+    cursor = data_store.db_connection.cursor()
+    cursor.execute('SELECT COUNT(*) FROM Listening_History')
+    assert cursor.fetchone()[0] == 122
+
+def test_migration_removes_duplicates(tmp_path, dataset1):
+    db_path = str(tmp_path / 'legacy.db')
+    store = SQLiteStore(db_path)
+    cursor = store.db_connection.cursor()
+    # Simulate a database written before Episode_UUID was unique.
+    cursor.executescript('''
+        DROP INDEX idx_listening_history_episode_uuid;
+        PRAGMA user_version = 0;
+    ''')
+    episode = dataset1['episodes'][0]
+    for _ in range(3):
+        cursor.execute('''
+            INSERT INTO Listening_History (Episode_UUID, URL, Published_Date, Duration, Title, Size, Is_Starred, Podcast_UUID, Podcast_Title, Author)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (episode['uuid'], episode['url'], episode['published'], episode['duration'], episode['title'],
+              episode['size'], episode['starred'], episode['podcastUuid'], episode['podcastTitle'], episode['author']))
+    store.db_connection.commit()
+    store.close()
+
+    store = SQLiteStore(db_path)
+    cursor = store.db_connection.cursor()
+    cursor.execute('SELECT ID FROM Listening_History')
+    assert cursor.fetchall() == [(1,)]
+    assert store.upsert_records([episode])['unchanged'] == 1
+    store.close()
+
+def test_get_records_page(data_store, dataset1):
+    data_store.save_records(dataset1['episodes'])
+
+    uuids = []
+    rows, key = data_store.get_records_page(30)
+    while True:
+        uuids.extend(row[1] for row in rows)
+        if key is None:
+            break
+        rows, key = data_store.get_records_page(30, after=key)
+
+    # Newest first, in the order episodes were listened to.
+    assert uuids == [ episode['uuid'] for episode in dataset1['episodes'] ]
+
+def test_iter_records(data_store, dataset1):
+    data_store.save_records(dataset1['episodes'])
+
+    batches = list(data_store.iter_records(batch_size=40, descending=False))
+
+    assert [ len(batch) for batch in batches ] == [40, 40, 20]
+    assert batches[0][0][1] == dataset1['episodes'][-1]['uuid']
+
+def test_date_saved_index_is_used(data_store):
+    cursor = data_store.db_connection.cursor()
+    cursor.execute('''
+        EXPLAIN QUERY PLAN
+        SELECT * FROM Listening_History
+        WHERE (Date_Saved, ID) < ('2030-01-01', 10)
+        ORDER BY Date_Saved DESC, ID DESC
+    ''')
+    plan = ' '.join(row[-1] for row in cursor.fetchall())
+
+    assert 'idx_listening_history_date_saved' in plan
+    assert 'TEMP B-TREE' not in plan
+
+def test_get_existing_uuids(data_store, dataset1):
+    data_store.save_records(dataset1['episodes'])
+    stored = { episode['uuid'] for episode in dataset1['episodes'] }
+    # Well past SQLite's host parameter limit.
+    unknown = [ f'unknown-{i}' for i in range(100000) ]
+
+    assert data_store.get_existing_uuids(list(stored)[:10] + ['unknown']) == set(list(stored)[:10])
+    assert data_store.get_existing_uuids(unknown + list(stored)) == stored
+    assert data_store.get_existing_uuids([]) == set()
+
+def test_streamed_and_buffered_saves_keep_the_same_order(tmp_path, dataset1):
+    episodes = dataset1['episodes'][:30]
+    buffered = SQLiteStore(str(tmp_path / 'buffered.db'))
+    streamed = SQLiteStore(str(tmp_path / 'streamed.db'))
+
+    buffered.upsert_records(episodes)
+    # Repeats keep the newest copy in both cases.
+    counts = streamed.save_record_stream(iter(episodes + episodes[5:8]), chunk_size=10)
+
+    assert counts == { 'inserted': 30, 'updated': 0, 'unchanged': 0 }
+    assert streamed.get_records() == buffered.get_records()
+    assert [ row[0] for row in streamed.get_records() ][:3] == [ episode['uuid'] for episode in episodes[:3] ]
+    buffered.close()
+    streamed.close()
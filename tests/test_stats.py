@@ -0,0 +1,86 @@
+from src.sqlite_store import SQLiteStore
+from src.stats import build_report, main
+
+def scan_totals(store, group_by):
+    cursor = store.db_connection.cursor()
+    cursor.execute(f'''
+        SELECT {group_by}, COUNT(*), SUM(Is_Starred), SUM(COALESCE(Duration, 0)), SUM(Size)
+        FROM Listening_History GROUP BY {group_by}
+    ''')
+    return { row[0]: row[1:] for row in cursor.fetchall() }
+
+def rollups(store, dimension):
+    return {
+        row['key']: (row['listens'], row['starred'], row['duration'], row['bytes'])
+        for row in store.get_stats(dimension)
+    }
+
+def test_stats_match_full_scan(data_store, dataset1, dataset3):
+    data_store.save_records(dataset1['episodes'])
+    data_store.save_records(dataset3['episodes'])
+
+    assert rollups(data_store, 'podcast') == scan_totals(data_store, 'Podcast_UUID')
+    assert rollups(data_store, 'author') == scan_totals(data_store, 'Author')
+    assert rollups(data_store, 'month') == scan_totals(data_store, 'substr(Date_Saved, 1, 7)')
+
+    summary = data_store.get_stats_summary()
+    listens, starred, duration, size = scan_totals(data_store, "''")['']
+    assert summary == {
+        'listens': listens, 'starred': starred, 'starred_ratio': starred / listens, 'duration': duration, 'bytes': size,
+    }
+
+def test_stats_follow_updates_and_deletes(data_store, dataset1):
+    episodes = dataset1['episodes']
+    data_store.save_records(episodes)
+    starred = data_store.get_stats_summary()['starred']
+
+    unstarred = next(episode for episode in episodes if not episode['starred'])
+    data_store.save_records([dict(unstarred, starred=True)])
+    data_store.update_sizes([(1, 0)])
+    data_store.db_connection.execute('DELETE FROM Listening_History WHERE ID = 2')
+
+    assert data_store.get_stats_summary()['starred'] == starred + 1
+    assert rollups(data_store, 'podcast') == scan_totals(data_store, 'Podcast_UUID')
+    assert rollups(data_store, 'author') == scan_totals(data_store, 'Author')
+
+def test_stats_ordering(data_store, dataset1):
+    data_store.save_records(dataset1['episodes'])
+
+    by_listens = data_store.get_stats('podcast', limit=3)
+    by_bytes = data_store.get_stats('podcast', order_by='bytes')
+
+    assert len(by_listens) == 3
+    assert [ row['listens'] for row in by_listens ] == sorted(( row['listens'] for row in by_listens ), reverse=True)
+    assert [ row['bytes'] for row in by_bytes ] == sorted(( row['bytes'] for row in by_bytes ), reverse=True)
+
+def test_stats_are_built_for_existing_rows(tmp_path, dataset1):
+    db_path = str(tmp_path / 'legacy.db')
+    store = SQLiteStore(db_path)
+    store.save_records(dataset1['episodes'])
+    # Simulate a database created before the statistics existed.
+    store.db_connection.executescript('''
+        DROP TRIGGER listening_stats_insert;
+        DROP TRIGGER listening_stats_update;
+        DROP TRIGGER listening_stats_delete;
+        DROP TABLE Listening_Stats;
+        PRAGMA user_version = 8;
+    ''')
+    store.close()
+
+    store = SQLiteStore(db_path)
+    assert store.get_stats_summary()['listens'] == 100
+    assert rollups(store, 'podcast') == scan_totals(store, 'Podcast_UUID')
+    store.close()
+
+def test_stats_report(tmp_path, dataset1, capsys):
+    db_path = str(tmp_path / 'cli.db')
+    store = SQLiteStore(db_path)
+    store.save_records(dataset1['episodes'])
+    assert build_report(store, ['author'], limit=1)['author'][0]['label'] == 'Bloomberg'
+    store.close()
+
+    assert main(['--db', db_path, '--by', 'podcast', '--limit', '2']) == 0
+
+    output = capsys.readouterr().out
+    assert 'Listens:  100' in output
+    assert 'By podcast:' in output and 'By author:' not in output
@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+from src.streaming import chunked, iter_json_array
+
+def split(data: bytes, size: int) -> list[bytes]:
+    return [ data[start:start + size] for start in range(0, len(data), size) ]
+
+@pytest.mark.parametrize('chunk_size', [1, 13, 4096])
+def test_iter_json_array_matches_json_loads(dataset1, chunk_size):
+    data = json.dumps(dataset1).encode()
+
+    assert list(iter_json_array(split(data, chunk_size), 'episodes')) == dataset1['episodes']
+
+def test_iter_json_array_finds_nested_key():
+    document = {
+        'podcast': {
+            'description': 'Not "episodes": [0] but a string',
+            'tags': ['episodes'],
+            'episodes': [1, 22.5, 'three', { 'title': 'Épisode' }, None],
+        }
+    }
+    data = json.dumps(document, ensure_ascii=False).encode()
+
+    assert list(iter_json_array(split(data, 2), 'episodes')) == document['podcast']['episodes']
+
+def test_iter_json_array_missing_key():
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'{"podcasts": []}'], 'episodes'))
+
+def test_chunked():
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
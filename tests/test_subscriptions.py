@@ -0,0 +1,110 @@
+import json
+import threading
+
+import pytest
+
+from src.pocketcasts import API_URL, APIError, PocketCastsClient, best_match
+from src.subscriptions import import_subscriptions, parse_opml
+from tests.conftest import FakeResponse
+
+OPML = '''<?xml version="1.0" encoding="utf-8"?>
+<opml version="1.0">
+  <head><title>Subscriptions</title></head>
+  <body>
+    <outline text="feeds">
+      <outline type="rss" text="Odd Lots" xmlUrl="https://example.com/oddlots.xml" />
+      <outline type="rss" text="Security Now" title="Security Now" author="TWiT" xmlUrl="https://example.com/sn.xml" />
+      <outline type="rss" text="Nothing Matches" xmlUrl="https://example.com/none.xml" />
+    </outline>
+  </body>
+</opml>'''
+
+SEARCHES = {
+    'odd lots': [{ 'uuid': 'odd-lots', 'title': 'Odd Lots', 'author': 'Bloomberg' }],
+    'security now': [
+        { 'uuid': 'sn-clips', 'title': 'Security Now Clips', 'author': 'Someone' },
+        { 'uuid': 'sn-fan', 'title': 'Security Now', 'author': 'A Fan' },
+        { 'uuid': 'sn', 'title': 'Security Now', 'author': 'TWiT' },
+    ],
+    'nothing matches': [{ 'uuid': 'cw', 'title': 'Cooking Weekly', 'author': 'Chef' }],
+}
+
+class SubscriptionClient():
+    def __init__(self, subscribed):
+        self.subscribed = subscribed
+        self.searches = []
+        self.added = []
+        self.lock = threading.Lock()
+
+    def search_podcasts(self, term):
+        with self.lock:
+            self.searches.append(term)
+        return { 'podcasts': SEARCHES[term] }
+
+    def get_subscriptions(self):
+        return { 'podcasts': [ { 'uuid': uuid } for uuid in self.subscribed ] }
+
+    def add_subscription(self, uuid):
+        with self.lock:
+            self.added.append(uuid)
+        return { 'uuid': uuid }
+
+class RejectingHTTP():
+    """Answers searches, but rejects subscribing, or listing subscriptions
+    as well, with a JSON error body."""
+    def __init__(self, subscriptions_status=200):
+        self.subscriptions_status = subscriptions_status
+
+    def request(self, method, url, headers=None, body=None, **kwargs):
+        if url == f'{API_URL}/discover/search':
+            return FakeResponse(json.dumps({ 'podcasts': SEARCHES[json.loads(body)['term']] }).encode())
+        if url == f'{API_URL}/user/podcast/list':
+            return FakeResponse(b'{"podcasts": []}', status=self.subscriptions_status)
+        return FakeResponse(b'{"errorMessage": "Forbidden"}', status=403)
+
+def test_parse_opml():
+    feeds = parse_opml(OPML)
+
+    assert [ feed['title'] for feed in feeds ] == ['Odd Lots', 'Security Now', 'Nothing Matches']
+    assert feeds[1]['author'] == 'TWiT'
+
+def test_best_match_uses_author():
+    podcasts = SEARCHES['security now']
+
+    assert best_match(podcasts, 'Security Now', 'TWiT')['uuid'] == 'sn'
+    assert best_match(podcasts, 'Security Now')['uuid'] == 'sn-fan'
+    assert best_match([], 'Security Now') is None
+
+def test_best_match_needs_a_title_match():
+    assert best_match([{ 'uuid': 'cw', 'title': 'Cooking Weekly' }], 'Hardcore History') is None
+    assert best_match([{ 'uuid': 'hh', 'title': "Dan Carlin's Hardcore History" }], 'Hardcore History')['uuid'] == 'hh'
+
+def test_import_subscriptions_uses_cache(data_store):
+    feeds = parse_opml(OPML)
+    client = SubscriptionClient(subscribed=['odd-lots'])
+
+    summary = import_subscriptions(client, data_store, feeds)
+
+    assert summary == { 'added': 1, 'already_subscribed': 1, 'failed': [], 'unresolved': ['Nothing Matches'] }
+    assert client.added == ['sn']
+    assert sorted(client.searches) == sorted(SEARCHES)
+
+    client = SubscriptionClient(subscribed=['odd-lots', 'sn'])
+    summary = import_subscriptions(client, data_store, feeds)
+
+    assert summary['added'] == 0
+    assert client.searches == []
+
+def test_rejected_subscribe_is_a_failure(data_store):
+    client = PocketCastsClient('token', RejectingHTTP())
+
+    summary = import_subscriptions(client, data_store, parse_opml(OPML))
+
+    assert summary['added'] == 0
+    assert summary['failed'] == ['odd-lots', 'sn']
+
+def test_failed_subscription_list_stops_the_import(data_store):
+    client = PocketCastsClient('token', RejectingHTTP(subscriptions_status=429))
+
+    with pytest.raises(APIError):
+        import_subscriptions(client, data_store, parse_opml(OPML))
@@ -0,0 +1,103 @@
+import json
+
+from src.sync import STORED_RUN, sync_history, take_new_episodes
+from src.pocketcasts import PocketCastsClient
+from tests.conftest import FakeResponse
+
+class FakeHistoryClient():
+    def __init__(self, payloads):
+        self.payloads = payloads
+        self.etags = []
+
+    def get_history_response(self, etag=None):
+        self.etags.append(etag)
+        response = self.payloads.pop(0)
+        if etag and response.headers.get('ETag') == etag:
+            return FakeResponse(b'', status=304)
+        return response
+
+def history_response(history, etag=None):
+    response = FakeResponse(json.dumps(history).encode())
+    response.headers = { 'ETag': etag } if etag else {}
+    return response
+
+def test_take_new_episodes(data_store, dataset2, dataset3):
+    assert take_new_episodes(dataset3['episodes'], data_store) == dataset3['episodes']
+
+    data_store.save_records(dataset2['episodes'])
+    new_episodes = take_new_episodes(dataset3['episodes'], data_store, dataset2['episodes'][0]['uuid'])
+
+    # 24 played since dataset2, two of them replays, then the stored run.
+    assert len(new_episodes) == 24 + STORED_RUN - 1
+    assert new_episodes == dataset3['episodes'][:len(new_episodes)]
+
+def test_reordered_history_is_not_lost(data_store):
+    def episode(uuid):
+        return {
+            'uuid': uuid, 'url': f'https://example.com/{uuid}.mp3', 'published': '2024-01-01T00:00:00Z',
+            'duration': 60, 'fileType': 'audio/mp3', 'title': uuid, 'size': '1', 'podcastUuid': 'p',
+            'podcastTitle': 'Podcast', 'author': 'Author', 'playingStatus': 3, 'starred': False,
+        }
+
+    old = [ episode(f'old-{i}') for i in range(STORED_RUN * 2) ]
+    client = FakeHistoryClient([
+        history_response({ 'episodes': [episode('A'), episode('B'), episode('C')] + old }),
+        # A was resumed, so it is back on top above the new E and D.
+        history_response({ 'episodes': [episode('A'), episode('E'), episode('D'), episode('B'), episode('C')] + old }),
+    ])
+
+    sync_history(client, data_store)
+    summary = sync_history(client, data_store)
+
+    assert summary['inserted'] == 2
+    assert data_store.get_existing_uuids(['D', 'E']) == {'D', 'E'}
+
+def test_sync_history_is_incremental(data_store, dataset2, dataset3):
+    client = FakeHistoryClient([
+        history_response(dataset2),
+        history_response(dataset2),
+        history_response(dataset3),
+    ])
+
+    assert sync_history(client, data_store)['inserted'] == 100
+
+    summary = sync_history(client, data_store)
+    assert summary['skipped'] and summary['inserted'] == 0
+
+    summary = sync_history(client, data_store)
+    assert summary['inserted'] == 22
+    assert summary['unchanged'] == 2 + STORED_RUN - 1
+    assert data_store.get_sync_state('history')['last_episode_uuid'] == dataset3['episodes'][0]['uuid']
+
+def test_sync_history_sends_etag(data_store, dataset2):
+    client = FakeHistoryClient([
+        history_response(dataset2, etag='"v1"'),
+        history_response(dataset2, etag='"v1"'),
+    ])
+
+    sync_history(client, data_store)
+    summary = sync_history(client, data_store)
+
+    assert client.etags == [None, '"v1"']
+    assert summary['skipped']
+
+class FakeStreamingClient(FakeHistoryClient):
+    def get_history_response(self, etag=None, stream=False):
+        return super().get_history_response(etag)
+
+    def stream_response_items(self, response, key):
+        self.response = response
+        return PocketCastsClient(None, None).stream_response_items(response, key, chunk_size=512)
+
+def test_sync_history_stream(data_store, dataset2, dataset3):
+    client = FakeStreamingClient([ history_response(dataset2), history_response(dataset3) ])
+
+    summary = sync_history(client, data_store, stream=True, chunk_size=10)
+    assert summary['inserted'] == 100
+
+    summary = sync_history(client, data_store, stream=True, chunk_size=10)
+    assert summary['inserted'] == 22
+    assert summary['unchanged'] == 2 + STORED_RUN - 1
+    # Stopped at the high-water mark without reading the rest of the body.
+    assert client.response.closed
+    assert data_store.get_sync_state('history')['last_episode_uuid'] == dataset3['episodes'][0]['uuid']
@@ -0,0 +1,114 @@
+import pytest
+
+from benchmarks.stub_server import StubAPIServer
+from benchmarks.synthetic import generate_history
+from src.pocketcasts import APIError, PocketCastsClient
+from src.sqlite_store import SQLiteStore
+from src.sync import sync_history
+from src.transport import (
+    CassetteMissError, CircuitBreaker, CircuitOpenError, JitteredRetry, Transport, default_retries, endpoint_key,
+)
+from tests.conftest import FakeHTTP
+
+class Clock():
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def stub_client(server, transport):
+    return PocketCastsClient('stub-token', transport, api_url=server.base_url, podcast_api_url=server.base_url)
+
+def test_jittered_retry_backoff():
+    retry = JitteredRetry(total=5, backoff_factor=1.0, jitter=0.5)
+    for _ in range(3):
+        retry = retry.increment('GET', '/history')
+
+    # Three consecutive errors: 1.0 * 2 ** 2 seconds plus up to 0.5 jitter.
+    assert 4.0 <= retry.get_backoff_time() <= 4.5
+    assert retry.jitter == 0.5
+
+def test_endpoint_key_groups_resources():
+    first = endpoint_key('GET', 'https://podcast-api.pocketcasts.com/podcast/full/5245ed80-2b9c-012e-0926-00163e1b201c')
+    second = endpoint_key('GET', 'https://podcast-api.pocketcasts.com/podcast/full/c8a51a10-66d1-0133-d185-0d11918ab357')
+
+    assert first == second == 'GET podcast-api.pocketcasts.com/podcast/full/{id}'
+    assert endpoint_key('POST', 'https://api.pocketcasts.com/user/history') == 'POST api.pocketcasts.com/user/history'
+
+def test_circuit_breaker_opens_and_recovers():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+
+    breaker.record('history', False)
+    assert breaker.allow('history')
+    breaker.record('history', False)
+    assert not breaker.allow('history') and breaker.is_open('history')
+    assert breaker.allow('search')
+
+    clock.now = 11
+    # One trial request after the timeout, the rest keep failing fast.
+    assert breaker.allow('history')
+    assert not breaker.allow('history')
+    breaker.record('history', True)
+    assert breaker.allow('history') and not breaker.is_open('history')
+
+def test_transport_retries_server_errors():
+    history = generate_history(50)
+    with StubAPIServer(history) as server:
+        transport = Transport(retries=default_retries(total=3, backoff_factor=0))
+        server.fail_history(2)
+
+        assert stub_client(server, transport).get_history() == history
+
+def test_outage_raises_and_opens_circuit():
+    with StubAPIServer(generate_history(50)) as server:
+        transport = Transport(
+            retries=default_retries(total=1, backoff_factor=0), breaker=CircuitBreaker(failure_threshold=2)
+        )
+        client = stub_client(server, transport)
+        store = SQLiteStore(':memory:')
+        server.fail_history(100)
+
+        for _ in range(2):
+            with pytest.raises(APIError):
+                sync_history(client, store)
+        remaining = server.failures
+        with pytest.raises(APIError) as error:
+            sync_history(client, store)
+
+        assert isinstance(error.value.__cause__, CircuitOpenError)
+        # The open circuit failed fast without sending anything.
+        assert server.failures == remaining
+        assert store.get_sync_state('history') == {}
+        store.close()
+
+def test_record_and_replay(tmp_path):
+    cassette = str(tmp_path / 'cassette.json')
+    history = generate_history(200)
+
+    with StubAPIServer(history) as server:
+        base_url = server.base_url
+        store = SQLiteStore(':memory:')
+        client = stub_client(server, Transport(cassette=cassette, mode='record'))
+        recorded = [ sync_history(client, store), sync_history(client, store, stream=True) ]
+        store.close()
+
+    # The server is gone; everything comes from the cassette.
+    store = SQLiteStore(':memory:')
+    transport = Transport(cassette=cassette, mode='replay')
+    client = PocketCastsClient('stub-token', transport, api_url=base_url, podcast_api_url=base_url)
+
+    assert [ sync_history(client, store), sync_history(client, store, stream=True) ] == recorded
+    assert recorded[0]['inserted'] == 200 and recorded[1]['skipped']
+    with pytest.raises(APIError) as error:
+        client.get_podcast_response('unknown')
+    assert isinstance(error.value.__cause__, CassetteMissError)
+    store.close()
+
+def test_transport_wraps_any_pool():
+    http = FakeHTTP({ 'https://api.pocketcasts.com/user/podcast/list': b'{"podcasts": []}' })
+    client = PocketCastsClient('abc', Transport(http))
+
+    assert client.get_subscriptions() == { 'podcasts': [] }
+    assert http.requests[0][0] == 'POST'